@@ -0,0 +1,145 @@
+"""
+Airfields and outlanding fields, for snapping takeoffs and landings.
+
+Without a field list the landing class is a single distance from the
+first fix of the flight to the last one: more than HOME_RADIUS (1500 m)
+is LOUT.  A winch launch from the far end of a big field, an aerotow
+retrieve or a landing at another airfield all come out wrong.  With
+--airfields the takeoff and landing are snapped to the nearest known
+field instead:
+
+    fields = Airfields.load('contest2024.cup')
+    fields.nearest(-35.2, 149.1)          # (index, metres) or None
+    fields.classify(flight)               # sets takeoff_field/landing_field
+
+Fields come from a SeeYou .cup waypoint file (only the landable styles:
+airfields, gliding sites and outlanding fields) or a plain CSV with
+name, lat and lon columns in decimal degrees and an optional style
+column using the .cup codes.  They are kept in a grid of CELL degree
+cells, so a lookup only measures the fields of the few cells around the
+point instead of every field.
+"""
+
+import csv
+import math
+import numpy as np
+
+from geodist import distance_m
+
+# Grid cell size (degrees); about 5.5 km north-south
+CELL = 0.05
+
+# SeeYou .cup waypoint styles that can be landed on
+AIRFIELD_STYLES = {2: 'airfield', 3: 'outlanding', 4: 'airfield', 5: 'airfield'}
+
+
+def _coord(text):
+    """'4708.250N' / '00739.500W' (.cup, DDDMM.mmm) or decimal degrees."""
+    text = text.strip()
+    if text[-1:].upper() in ('N', 'S', 'E', 'W'):
+        value = float(text[:-1])
+        deg = int(value // 100)
+        value = deg + (value - 100 * deg) / 60.0
+        return -value if text[-1].upper() in ('S', 'W') else value
+    return float(text)
+
+
+class Airfields(object):
+    """
+    Named fields with a kind ('airfield' or 'outlanding') and a grid index.
+    """
+
+    def __init__(self, names, lat, lon, kinds):
+        self.names = list(names)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.kinds = list(kinds)
+        cells = {}
+        for i, key in enumerate(zip(np.floor(self.lat / CELL).astype(int).tolist(),
+                                    np.floor(self.lon / CELL).astype(int).tolist())):
+            cells.setdefault(key, []).append(i)
+        self.cells = {key: np.array(idx, dtype=np.intp) for key, idx in cells.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def load(cls, path):
+        """Read a .cup waypoint file or a name/lat/lon CSV."""
+        names, lat, lon, kinds = [], [], [], []
+        with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+            reader = csv.reader(f)
+            header = [h.strip().lower() for h in next(reader, [])]
+            col = {h: i for i, h in enumerate(header)}
+            ilat = col.get('lat', col.get('latitude'))
+            ilon = col.get('lon', col.get('longitude', col.get('lng')))
+            if 'name' not in col or ilat is None or ilon is None:
+                raise ValueError(f"{path}: expected name, lat and lon columns")
+            istyle = col.get('style')
+            for row in reader:
+                if row and row[0].startswith('-----'):
+                    break  # the task section of a .cup file
+                if len(row) <= max(ilat, ilon):
+                    continue
+                kind = 'airfield'
+                if istyle is not None and istyle < len(row):
+                    try:
+                        kind = AIRFIELD_STYLES.get(int(row[istyle]))
+                    except ValueError:
+                        pass
+                    if kind is None:
+                        continue
+                try:
+                    la, lo = _coord(row[ilat]), _coord(row[ilon])
+                except ValueError:
+                    continue
+                names.append(row[col['name']].strip())
+                lat.append(la)
+                lon.append(lo)
+                kinds.append(kind)
+        return cls(names, lat, lon, kinds)
+
+    def nearest(self, lat, lon, max_m=3000.0):
+        """(index, metres) of the nearest field within `max_m`, else None."""
+        ci = int(math.floor(lat / CELL))
+        cj = int(math.floor(lon / CELL))
+        ni = int(math.ceil(max_m / (111320.0 * CELL)))
+        coslat = max(math.cos(math.radians(min(abs(lat) + ni * CELL, 89.9))), 1e-3)
+        nj = int(math.ceil(max_m / (111320.0 * CELL * coslat)))
+        found = [self.cells[key] for key in
+                 ((i, j) for i in range(ci - ni, ci + ni + 1)
+                  for j in range(cj - nj, cj + nj + 1))
+                 if key in self.cells]
+        if not found:
+            return None
+        idx = np.concatenate(found)
+        d = distance_m(lat, lon, self.lat[idx], self.lon[idx])
+        k = int(np.argmin(d))
+        if d[k] > max_m:
+            return None
+        return int(idx[k]), float(d[k])
+
+    def classify(self, flight, max_m=3000.0):
+        """
+        Snap `flight`'s takeoff and landing to the nearest fields and set
+        takeoff_field / landing_field to (name, metres) or None.
+
+        The landing class becomes HOME when both snap to the same field,
+        AWAY for another airfield and LOUT for an outlanding field.  A
+        landing near no known field keeps the distance rule of flights.py,
+        as does one at an airfield when the takeoff matched no field and
+        the flight ended near where it started.
+        """
+        to = self.nearest(flight.start_pos[0], flight.start_pos[1], max_m)
+        ld = self.nearest(flight.end_pos[0], flight.end_pos[1], max_m)
+        flight.takeoff_field = (self.names[to[0]], to[1]) if to else None
+        flight.landing_field = (self.names[ld[0]], ld[1]) if ld else None
+        if ld is None:
+            return flight
+        if to is not None and to[0] == ld[0]:
+            flight.landing_class = 'HOME'
+        elif self.kinds[ld[0]] == 'outlanding':
+            flight.landing_class = 'LOUT'
+        elif to is not None or flight.landing_class != 'HOME':
+            flight.landing_class = 'AWAY'
+        return flight
@@ -0,0 +1,155 @@
+"""
+IGC logs inside zip and tar archives, read without extracting them.
+
+A log inside an archive is addressed as "<archive path>::<member name>",
+which read_source() (and so igc_parser.read_igc()) opens like a file path:
+
+    refs = archive_members('wgc2024.zip')
+    refs[0]                       # 'wgc2024.zip::2024/4536-9239003146.igc'
+    igc = read_igc(refs[0])
+    source_name(refs[0])          # '4536-9239003146.igc', the CSV "File" value
+
+    for ref, data in iter_archive('wgc2023.tar.gz'):   # one sequential pass
+        ...
+
+Supported: .zip, .tar, .tar.gz / .tgz, .tar.bz2, .tar.xz.  Members are
+read through one handle per archive and thread, so workers pulling
+members in archive order decompress a compressed tar only once each.
+Each thread keeps at most MAX_HANDLES archives open and closes the one
+it used least recently, so runs over many archives keep few files open.
+"""
+
+import os
+import time
+import tarfile
+import threading
+import zipfile
+from collections import OrderedDict
+
+SEP = '::'
+
+# Archive handles kept open per thread
+MAX_HANDLES = 8
+
+ARCHIVE_EXTS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+_local = threading.local()
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_EXTS)
+
+
+def split_member(path):
+    """(archive, member) for an archive member reference, (path, None) otherwise."""
+    archive, sep, member = path.partition(SEP)
+    if sep and is_archive(archive):
+        return archive, member
+    return path, None
+
+
+def source_name(path):
+    """Short name of a file or archive member, as reported in the CSV."""
+    archive, member = split_member(path)
+    return os.path.basename(member if member is not None else archive)
+
+
+def _is_igc(name):
+    base = os.path.basename(name)
+    # Skip macOS resource forks ("__MACOSX/._x.igc") that zips often carry
+    return (name.lower().endswith('.igc') and not base.startswith('._')
+            and '__MACOSX/' not in name)
+
+
+def _open(archive):
+    if archive.lower().endswith('.zip'):
+        return zipfile.ZipFile(archive)
+    return tarfile.open(archive)
+
+
+def archive_members(archive):
+    """References to every .igc member of `archive`, in archive order."""
+    with _open(archive) as arc:
+        if isinstance(arc, zipfile.ZipFile):
+            names = [i.filename for i in arc.infolist() if not i.is_dir()]
+        else:
+            names = [m.name for m in arc.getmembers() if m.isfile()]
+    return [archive + SEP + name for name in names if _is_igc(name)]
+
+
+def _handle(archive):
+    handles = getattr(_local, 'handles', None)
+    if handles is None:
+        handles = _local.handles = OrderedDict()
+    arc = handles.pop(archive, None)
+    if arc is None:
+        arc = _open(archive)
+        while len(handles) >= MAX_HANDLES:
+            handles.popitem(last=False)[1].close()
+    handles[archive] = arc  # most recently used last
+    return arc
+
+
+def read_source(path):
+    """Raw bytes of a file path or of an archive member reference."""
+    archive, member = split_member(path)
+    if member is None:
+        with open(path, 'rb') as f:
+            return f.read()
+    arc = _handle(archive)
+    if isinstance(arc, zipfile.ZipFile):
+        return arc.read(member)
+    f = arc.extractfile(member)
+    if f is None:
+        raise OSError(f"{member} in {archive} is not a regular file")
+    return f.read()
+
+
+def iter_archive(archive):
+    """
+    Yield (reference, bytes) for every .igc member in one sequential pass,
+    streaming compressed tars instead of seeking in them.
+    """
+    if archive.lower().endswith('.zip'):
+        with zipfile.ZipFile(archive) as arc:
+            for info in arc.infolist():
+                if not info.is_dir() and _is_igc(info.filename):
+                    yield archive + SEP + info.filename, arc.read(info)
+        return
+    with tarfile.open(archive, 'r|*') as arc:
+        for m in arc:
+            if m.isfile() and _is_igc(m.name):
+                yield archive + SEP + m.name, arc.extractfile(m).read()
+
+
+class MemberStat(object):
+    """
+    Size, mtime and CRC-32 (zip members; None in a tar) of an archive
+    member, from the archive's index, named like os.stat_result fields.
+    """
+
+    __slots__ = ('st_size', 'st_mtime', 'st_mtime_ns', 'crc')
+
+    def __init__(self, size, mtime, crc=None):
+        self.st_size = size
+        self.st_mtime = mtime
+        self.st_mtime_ns = int(mtime * 1e9)
+        self.crc = crc
+
+
+def stat_source(path):
+    """
+    os.stat() of a file, or a MemberStat of an archive member: a member
+    keeps its stat when other members are added to the archive or it is
+    touched.  Raises KeyError for a member the archive no longer holds.
+    """
+    archive, member = split_member(path)
+    if member is None:
+        return os.stat(path)
+    arc = _handle(archive)
+    if isinstance(arc, zipfile.ZipFile):
+        info = arc.getinfo(member)
+        return MemberStat(info.file_size, time.mktime(info.date_time + (0, 0, -1)),
+                          info.CRC)
+    info = arc.getmember(member)
+    return MemberStat(info.size, float(info.mtime))
@@ -0,0 +1,383 @@
+#!/usr/bin/python
+"""
+Throughput benchmark on synthetic IGC files.
+
+Generates a set of IGC files and a small DEM over the same synthetic
+terrain, then times each stage of the engine in its own process and
+reports fixes/s, files/s and peak RSS:
+
+    python bench.py run                          # 40 two-hour files, all stages
+    python bench.py run --files 200 --rate 4 --ext ENL,MOP,GSP --workers 4
+    python bench.py gen bench_data --files 10    # just write the files + DEM
+
+Stages:
+    parse     igc_parser.read_igc() on every file
+    detect    flights.iter_flights() on files already parsed
+    cache     fix_cache.FixCache reads of files already cached
+    thread    the whole CLI with --executor thread
+    process   the whole CLI with --executor process
+
+The report is printed and written to bench_output.txt.
+"""
+
+import sys
+import os
+import json
+import math
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, 'glider-engine_edited.py')
+
+STAGES = ('parse', 'detect', 'cache', 'thread', 'process')
+
+# Synthetic DEM extent (degrees) and resolution
+DEM_LAT = (38.0, 42.0)
+DEM_LON = (-107.0, -103.0)
+DEM_RES = 0.01
+
+# Extension widths in the B record
+EXT_WIDTH = {'FXA': 3, 'ENL': 3, 'MOP': 3, 'RPM': 4, 'GSP': 3}
+
+
+def terrain(lat, lon):
+    """Synthetic ground height (m): rolling hills around 1600 m."""
+    return 1600 + 250*np.sin(lat*7.0)*np.cos(lon*5.0) + 80*np.sin(lat*31.0 + lon*23.0)
+
+
+# ---------------------------
+# Synthetic DEM
+# ---------------------------
+def synth_dem(path):
+    """
+    Write the synthetic terrain as a DEM.  A .tif is written with rasterio,
+    anything else as the .npy + .json pair dem_store.DEM.open() reads.
+    """
+    rows = int(round((DEM_LAT[1] - DEM_LAT[0]) / DEM_RES))
+    cols = int(round((DEM_LON[1] - DEM_LON[0]) / DEM_RES))
+    lat = DEM_LAT[1] - (np.arange(rows) + 0.5) * DEM_RES
+    lon = DEM_LON[0] + (np.arange(cols) + 0.5) * DEM_RES
+    band = terrain(lat[:, None], lon[None, :]).astype(np.int16)
+    transform = (DEM_RES, 0.0, DEM_LON[0], 0.0, -DEM_RES, DEM_LAT[1])
+
+    stem, ext = os.path.splitext(path)
+    if ext.lower() in ('.tif', '.tiff'):
+        import rasterio as rio
+        from affine import Affine
+
+        with rio.open(path, 'w', driver='GTiff', height=rows, width=cols, count=1,
+                      dtype='int16', crs='EPSG:4326', nodata=-32768,
+                      transform=Affine(*transform)) as ds:
+            ds.write(band, 1)
+        return path
+    np.save(stem + '.npy', band)
+    meta = {'source': 'bench.py', 'shape': [rows, cols], 'dtype': 'int16',
+            'transform': list(transform), 'nodata': -32768, 'crs': 'EPSG:4326'}
+    with open(stem + '.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=1)
+    return stem + '.npy'
+
+
+# ---------------------------
+# Synthetic IGC files
+# ---------------------------
+def _lat(lat):
+    h = 'N' if lat >= 0 else 'S'
+    lat = abs(lat)
+    d = int(lat)
+    return '%02d%05d%s' % (d, min(59999, round((lat - d) * 60000)), h)
+
+
+def _lon(lon):
+    h = 'E' if lon >= 0 else 'W'
+    lon = abs(lon)
+    d = int(lon)
+    return '%03d%05d%s' % (d, min(59999, round((lon - d) * 60000)), h)
+
+
+def synth_igc(path, seed=0, duration=7200, rate=1, ext=('ENL', 'MOP'),
+              engine_runs=1, bad=0.01, start=64800, gtype='JS-3-18m'):
+    """
+    Write one synthetic flight to `path` and return its number of B records.
+
+    The glider sits on the ground for a few minutes, climbs out, wanders in
+    slow circles for `duration` seconds and lands, one fix every `rate`
+    seconds starting at `start` (seconds of the UTC day, wraps at
+    midnight).  `ext` are the I-record extensions to log (ENL, MOP, RPM,
+    GSP); during each of `engine_runs` runs ENL/MOP/RPM read high and the
+    glider climbs.  A fraction `bad` of the fixes are damaged: invalid
+    flag, pressure spike, position jump or garbled digits.
+    """
+    r = random.Random(seed)
+    lat = r.uniform(DEM_LAT[0] + 1, DEM_LAT[1] - 1)
+    lon = r.uniform(DEM_LON[0] + 1, DEM_LON[1] - 1)
+    ground = float(terrain(lat, lon))
+    alt = ground
+    hd = r.uniform(0, 2*math.pi)
+    turn = r.choice((-1, 1)) * 2*math.pi / r.uniform(1800, 5400)
+
+    ext = [tag for tag in ext if tag in EXT_WIDTH]
+    lines = ['AXXXBENCH',
+             'HFDTEDATE:%s,01' % time.strftime('%d%m%y', time.gmtime(1.7e9 + seed*86400)),
+             'HFGTYGLIDERTYPE:' + gtype,
+             'HFGIDGLIDERID:N%d' % (seed % 100000)]
+    if ext:
+        iline = 'I%02d' % len(ext)
+        pos = 36
+        for tag in ext:
+            iline += '%02d%02d%s' % (pos, pos + EXT_WIDTH[tag] - 1, tag)
+            pos += EXT_WIDTH[tag]
+        lines.append(iline)
+
+    ground_time = 300
+    runs = []
+    for _ in range(engine_runs):
+        s = r.uniform(900, max(901, duration - 1200))
+        runs.append((s, s + r.uniform(120, 600)))
+    nb = 0
+    t = 0
+    while t < duration + 2*ground_time:
+        el = t - ground_time
+        engine = any(s <= el < e for s, e in runs)
+        if el < 0 or el >= duration:
+            spd = 0.0
+            alt = float(terrain(lat, lon))
+        else:
+            spd = r.uniform(25, 35)
+            hd += turn*rate + r.uniform(-0.05, 0.05)
+            lat += spd*rate*math.cos(hd) / 111000
+            lon += spd*rate*math.sin(hd) / (111000*math.cos(math.radians(lat)))
+            floor = float(terrain(lat, lon))
+            if el < 300 or engine:
+                alt += 2.5*rate
+            elif el >= duration - 400:
+                alt = max(floor, alt - 6*rate)
+            else:
+                alt = max(floor + 300, alt + r.uniform(-1.5, 1.5)*rate)
+        tod = int(start + t) % 86400
+        rec = 'B%02d%02d%02d%s%sA%05d%05d' % (tod // 3600, (tod // 60) % 60, tod % 60,
+                                              _lat(lat), _lon(lon), int(alt), int(alt) + 12)
+        for tag in ext:
+            w = EXT_WIDTH[tag]
+            if tag == 'ENL':
+                v = r.randint(700, 950) if engine else r.randint(0, 120)
+            elif tag == 'MOP':
+                v = r.randint(600, 900) if engine else r.randint(0, 40)
+            elif tag == 'RPM':
+                v = r.randint(5000, 6500) if engine else 0
+            elif tag == 'GSP':
+                v = int(spd * 3.6)
+            else:
+                v = r.randint(0, 10**w - 1)
+            rec += '%0*d' % (w, min(v, 10**w - 1))
+        if r.random() < bad:
+            kind = r.randrange(4)
+            if kind == 0:
+                rec = rec[:24] + 'V' + rec[25:]
+            elif kind == 1:
+                rec = rec[:25] + '%05d' % min(99999, int(alt) + 1500) + rec[30:]
+            elif kind == 2:
+                rec = rec[:7] + _lat(lat + 0.5) + rec[15:]
+            else:
+                rec = rec[:9] + 'X#' + rec[11:]
+        lines.append(rec)
+        nb += 1
+        t += rate
+    lines.append('GBENCH')
+    with open(path, 'w', newline='') as f:
+        f.write('\r\n'.join(lines) + '\r\n')
+    return nb
+
+
+def generate(outdir, files=40, seed=0, dem='dem.npy', **kw):
+    """
+    Write `files` synthetic IGC files plus the DEM into `outdir`.
+    Returns (igc paths, DEM path, total B records).
+    """
+    os.makedirs(outdir, exist_ok=True)
+    dem_path = synth_dem(os.path.join(outdir, dem))
+    paths = []
+    nfix = 0
+    for i in range(files):
+        path = os.path.join(outdir, 'bench-%05d.igc' % i)
+        nfix += synth_igc(path, seed=seed + i, **kw)
+        paths.append(path)
+    return paths, dem_path, nfix
+
+
+# ---------------------------
+# Stages, each run in a fresh process
+# ---------------------------
+def _peak_rss():
+    """Peak RSS (bytes) of this process and of its largest waited-for child."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return scale * max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                       resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def run_stage(stage, datadir, dem_path, workers):
+    """Time one stage over the files in `datadir`; returns a result dict."""
+    sys.path.insert(0, HERE)
+    from igc_parser import read_igc
+    from dem_store import DEM
+    from flights import iter_flights
+    from fix_cache import FixCache, dem_key
+
+    paths = sorted(os.path.join(datadir, f) for f in os.listdir(datadir)
+                   if f.lower().endswith('.igc'))
+    nfix = 0
+    nflight = 0
+    if stage == 'parse':
+        t0 = time.perf_counter()
+        for path in paths:
+            nfix += len(read_igc(path))
+        elapsed = time.perf_counter() - t0
+    elif stage == 'detect':
+        dem = DEM.open(dem_path)
+        igcs = [read_igc(path) for path in paths]
+        t0 = time.perf_counter()
+        for igc in igcs:
+            nfix += len(igc)
+            nflight += sum(1 for _ in iter_flights(igc, dem))
+        elapsed = time.perf_counter() - t0
+    elif stage == 'cache':
+        dem = DEM.open(dem_path)
+        # Not in `datadir`, which may be the user's own --data
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = FixCache(os.path.join(tmp, 'fixcache'), dem_key(dem_path))
+            for path in paths:
+                cache.read(path, dem)
+            t0 = time.perf_counter()
+            for path in paths:
+                nfix += len(cache.read(path, dem))
+            elapsed = time.perf_counter() - t0
+    elif stage in ('thread', 'process'):
+        nfix = sum(len(read_igc(path)) for path in paths)
+        with tempfile.TemporaryDirectory() as out:
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, SCRIPT, os.path.abspath(datadir),
+                            '--executor', stage, '--workers', str(workers),
+                            '--dem', os.path.abspath(dem_path)],
+                           cwd=out, stdout=subprocess.DEVNULL, check=True)
+            elapsed = time.perf_counter() - t0
+    else:
+        raise ValueError(f"Unknown stage {stage!r}")
+    return {'stage': stage, 'files': len(paths), 'fixes': nfix, 'flights': nflight,
+            'seconds': elapsed, 'peak_rss': _peak_rss()}
+
+
+def _stage_in_subprocess(stage, datadir, dem_path, workers):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '_stage', stage,
+                          datadir, dem_path, str(workers)],
+                         stdout=subprocess.PIPE, check=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def report(results, settings):
+    lines = ['Benchmark: ' + ', '.join(f"{k}={v}" for k, v in settings.items()),
+             '%-8s %6s %10s %9s %12s %9s %10s' % ('stage', 'files', 'fixes', 'seconds',
+                                                  'fixes/s', 'files/s', 'peak MB')]
+    for res in results:
+        sec = max(res['seconds'], 1e-9)
+        rss = '%.1f' % (res['peak_rss'] / 2**20) if res['peak_rss'] else '-'
+        lines.append('%-8s %6d %10d %9.3f %12.0f %9.1f %10s' % (
+            res['stage'], res['files'], res['fixes'], res['seconds'],
+            res['fixes'] / sec, res['files'] / sec, rss))
+    return '\n'.join(lines)
+
+
+def _gen_args(parser):
+    parser.add_argument('--files', type=int, default=40, help='number of IGC files (default: 40)')
+    parser.add_argument('--duration', type=int, default=7200,
+                        help='flight length in seconds (default: 7200)')
+    parser.add_argument('--rate', type=int, default=1, help='seconds between fixes (default: 1)')
+    parser.add_argument('--ext', default='ENL,MOP',
+                        help='I-record extensions, any of ENL,MOP,RPM,GSP (default: ENL,MOP)')
+    parser.add_argument('--engine-runs', type=int, default=1,
+                        help='engine runs per flight (default: 1)')
+    parser.add_argument('--bad', type=float, default=0.01,
+                        help='fraction of damaged fixes (default: 0.01)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dem', default='dem.npy',
+                        help='DEM file name, .tif needs rasterio (default: dem.npy)')
+
+
+def _generate(args, outdir):
+    return generate(outdir, files=args.files, seed=args.seed, dem=args.dem,
+                    duration=args.duration, rate=args.rate,
+                    ext=[t.strip().upper() for t in args.ext.split(',') if t.strip()],
+                    engine_runs=args.engine_runs, bad=args.bad)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '_stage':
+        stage, datadir, dem_path, workers = sys.argv[2:6]
+        print(json.dumps(run_stage(stage, datadir, dem_path, int(workers))))
+        return
+
+    parser = argparse.ArgumentParser(prog='bench.py', description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest='cmd')
+    gen = sub.add_parser('gen', help='write synthetic IGC files and a DEM')
+    gen.add_argument('outdir')
+    _gen_args(gen)
+    run = sub.add_parser('run', help='generate data and time every stage')
+    _gen_args(run)
+    run.add_argument('--data', metavar='DIR',
+                     help='use (or create) the files in DIR instead of a temporary directory')
+    run.add_argument('--stages', default=','.join(STAGES),
+                     help=f"comma separated stages (default: {','.join(STAGES)})")
+    run.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                     help='workers for the thread/process stages (default: CPU count)')
+    run.add_argument('--out', default=os.path.join(HERE, 'bench_output.txt'),
+                     help='report file (default: bench_output.txt)')
+    args = parser.parse_args()
+
+    if args.cmd == 'gen':
+        paths, dem_path, nfix = _generate(args, args.outdir)
+        print(f"Wrote {len(paths)} IGC file(s), {nfix} fixes, and {dem_path}")
+        return
+    if args.cmd != 'run':
+        parser.print_help()
+        return
+
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    for stage in stages:
+        if stage not in STAGES:
+            parser.error(f"Unknown stage {stage!r}, choose from {', '.join(STAGES)}")
+    with tempfile.TemporaryDirectory() as tmp:
+        datadir = args.data or tmp
+        dem_path = os.path.join(datadir, args.dem)
+        generated = args.data is None or not os.path.exists(dem_path)
+        if generated:
+            _, dem_path, _ = _generate(args, datadir)
+        results = []
+        for stage in stages:
+            res = _stage_in_subprocess(stage, datadir, dem_path, args.workers)
+            print(f"{stage}: {res['seconds']:.3f}s")
+            results.append(res)
+    if generated:
+        settings = {'files': args.files, 'duration': args.duration, 'rate': args.rate,
+                    'ext': args.ext, 'workers': args.workers}
+    else:
+        # An existing dataset: what is there, not the generator options
+        settings = {'data': args.data,
+                    'files': max((res['files'] for res in results), default=0),
+                    'fixes': max((res['fixes'] for res in results), default=0),
+                    'workers': args.workers}
+    text = report(results, settings)
+    print(text)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        f.write(text + '\n')
+
+
+if __name__ == "__main__":
+    main()
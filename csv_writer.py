@@ -0,0 +1,137 @@
+"""
+Per-year CSV output written by one consumer thread.
+
+Workers used to take a global lock and write their rows straight into the
+shared Flt-times_{year}.csv writers, so row order followed thread timing
+and nothing reached the disk before the files were closed.  Here the
+main thread hands each input file's rows, tagged with the file's position
+in the input order, to an OrderedWriter through a bounded queue; its
+thread writes them in that order and flushes every few hundred rows or
+seconds, so an interrupted run leaves complete rows on disk:
+
+    out = OrderedWriter(YearCSVs(header))
+    out.put(seq, rows)            # rows = [(flight_year, row), ...]
+    ...
+    out.close()
+"""
+
+import csv
+import time
+import queue
+import threading
+
+
+class YearCSVs(object):
+    """
+    One Flt-times_{year}.csv per flight year, opened and given `header`
+    on first use.  Not thread-safe; OrderedWriter is its only caller.
+    """
+
+    def __init__(self, header, pattern='Flt-times_{year}.csv'):
+        self.header = header
+        self.pattern = pattern
+        self.files = {}
+        self.writers = {}
+
+    def write(self, rows):
+        for flight_year, row in rows:
+            writer = self.writers.get(flight_year)
+            if writer is None:
+                f = open(self.pattern.format(year=flight_year), 'w', newline='',
+                         encoding='utf-8')
+                writer = csv.writer(f)
+                writer.writerow(self.header)
+                self.files[flight_year] = f
+                self.writers[flight_year] = writer
+            writer.writerow(row)
+
+    def flush(self):
+        for f in self.files.values():
+            f.flush()
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+        self.writers = {}
+
+
+class OrderedWriter(object):
+    """
+    Single consumer of a bounded queue of (seq, rows) batches.
+
+    Batches are written in seq order (0, 1, 2, ...) whatever order they
+    arrive in; every seq must be put once, with [] for files that gave no
+    rows.  put() blocks while `maxsize` batches are waiting.  The sink is
+    flushed after `flush_rows` rows or `flush_secs` seconds.
+    """
+
+    def __init__(self, sink, maxsize=256, flush_rows=500, flush_secs=5.0):
+        self.sink = sink
+        self.flush_rows = flush_rows
+        self.flush_secs = flush_secs
+        self.rows = 0
+        self.flushes = 0
+        self.seconds = 0.0
+        self._queue = queue.Queue(maxsize)
+        self._pending = {}
+        self._next = 0
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='csv-writer', daemon=True)
+        self._thread.start()
+
+    def put(self, seq, rows):
+        if self._error is not None:
+            raise self._error
+        self._queue.put((seq, list(rows)))
+
+    def close(self):
+        """Write whatever is left, flush and close the sink."""
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _write(self, rows):
+        t0 = time.perf_counter()
+        self.sink.write(rows)
+        self.seconds += time.perf_counter() - t0
+        self.rows += len(rows)
+
+    def _run(self):
+        unflushed = 0
+        last_flush = time.monotonic()
+        closing = False
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_secs)
+                except queue.Empty:
+                    item = False
+                if item is None:
+                    closing = True
+                    break
+                if item:
+                    seq, rows = item
+                    self._pending[seq] = rows
+                    while self._next in self._pending:
+                        rows = self._pending.pop(self._next)
+                        self._next += 1
+                        self._write(rows)
+                        unflushed += len(rows)
+                if unflushed and (unflushed >= self.flush_rows or
+                                  time.monotonic() - last_flush >= self.flush_secs):
+                    self.sink.flush()
+                    self.flushes += 1
+                    unflushed = 0
+                    last_flush = time.monotonic()
+            # Batches after a seq that never came, still in order
+            for seq in sorted(self._pending):
+                self._write(self._pending.pop(seq))
+        except Exception as e:
+            self._error = e
+            # Keep draining so put() callers do not block forever
+            while not closing and self._queue.get() is not None:
+                pass
+        finally:
+            self.sink.close()
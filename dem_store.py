@@ -0,0 +1,261 @@
+#!/usr/bin/python
+"""
+Memory-mapped DEM store.
+
+Reading conus.tif with rasterio loads the whole CONUS band into RAM before
+the first file is processed.  convert_dem() does that once and writes the
+band to a .npy file plus a small .json sidecar holding the affine transform,
+so later runs can np.load(..., mmap_mode='r') it: startup is near-instant,
+only the pages that flights touch are read, and worker processes share one
+copy through the page cache.
+
+    python dem_store.py conus.tif            # writes conus.npy + conus.json
+"""
+
+import sys
+import os
+import json
+import time
+import threading
+import numpy as np
+
+
+class DEMError(Exception):
+    """The DEM cannot be opened; no file can get ground heights."""
+
+
+class DEM(object):
+    """
+    DEM band plus its affine transform.
+
+    `band` is a 2-D array (a read-only memmap when opened from .npy) and
+    `transform` the six GDAL/rasterio affine coefficients (a, b, c, d, e, f)
+    mapping (col, row) to (x, y).  `index(x, y)` returns (row, col) like
+    rasterio's DatasetReader.index, so it can stand in for an open dataset.
+    """
+
+    def __init__(self, band, transform, nodata=None, crs=None):
+        self.band = band
+        self.transform = tuple(float(v) for v in transform[:6])
+        self.nodata = nodata
+        self.crs = crs
+        a, b, c, d, e, f = self.transform
+        det = a * e - b * d
+        # Inverse affine, (x, y) -> (col, row)
+        self._inv = (e / det, -b / det, (b * f - e * c) / det,
+                     -d / det, a / det, (d * c - a * f) / det)
+
+    @property
+    def shape(self):
+        return self.band.shape
+
+    def index(self, x, y):
+        ia, ib, ic, id_, ie, if_ = self._inv
+        col = ia * x + ib * y + ic
+        row = id_ * x + ie * y + if_
+        return int(np.floor(row)), int(np.floor(col))
+
+    def contains(self, lat, lon):
+        """Boolean mask of the points that fall on the raster."""
+        ia, ib, ic, id_, ie, if_ = self._inv
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        col = ia * lon + ib * lat + ic
+        row = id_ * lon + ie * lat + if_
+        nrows, ncols = self.band.shape
+        return (row >= 0) & (row < nrows) & (col >= 0) & (col < ncols)
+
+    def sample(self, lat, lon, method='nearest', fill=0):
+        """
+        Ground elevation for whole arrays of points in one pass.
+
+        'nearest' takes the pixel containing each point (what index() and
+        the old per-fix lookup return), 'bilinear' interpolates between the
+        four surrounding pixel centres.  Points outside the raster, or
+        touching a nodata pixel, get `fill` instead of raising IndexError.
+        Returns float64 elevations in the band's units.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        ia, ib, ic, id_, ie, if_ = self._inv
+        col = ia * lon + ib * lat + ic
+        row = id_ * lon + ie * lat + if_
+        nrows, ncols = self.band.shape
+        out = np.full(lat.shape, fill, dtype=np.float64)
+        inside = (row >= 0) & (row < nrows) & (col >= 0) & (col < ncols)
+
+        if method == 'nearest':
+            r = row[inside].astype(np.intp)
+            c = col[inside].astype(np.intp)
+            val = np.asarray(self.band[r, c], dtype=np.float64)
+            if self.nodata is not None:
+                val[val == self.nodata] = fill
+            out[inside] = val
+            return out
+        if method != 'bilinear':
+            raise ValueError(f"Unknown sampling method: {method}")
+
+        # Pixel centres sit at +0.5; clamp the neighbours at the raster edge
+        y = row[inside] - 0.5
+        x = col[inside] - 0.5
+        r0 = np.clip(np.floor(y).astype(np.intp), 0, nrows - 1)
+        c0 = np.clip(np.floor(x).astype(np.intp), 0, ncols - 1)
+        r1 = np.minimum(r0 + 1, nrows - 1)
+        c1 = np.minimum(c0 + 1, ncols - 1)
+        fy = np.clip(y - r0, 0.0, 1.0)
+        fx = np.clip(x - c0, 0.0, 1.0)
+        z00 = np.asarray(self.band[r0, c0], dtype=np.float64)
+        z01 = np.asarray(self.band[r0, c1], dtype=np.float64)
+        z10 = np.asarray(self.band[r1, c0], dtype=np.float64)
+        z11 = np.asarray(self.band[r1, c1], dtype=np.float64)
+        val = (z00 * (1 - fx) * (1 - fy) + z01 * fx * (1 - fy)
+               + z10 * (1 - fx) * fy + z11 * fx * fy)
+        if self.nodata is not None:
+            nod = ((z00 == self.nodata) | (z01 == self.nodata)
+                   | (z10 == self.nodata) | (z11 == self.nodata))
+            val[nod] = fill
+        out[inside] = val
+        return out
+
+    @classmethod
+    def from_rasterio(cls, dataset):
+        """Read band 1 of an open rasterio dataset into memory."""
+        crs = dataset.crs.to_string() if dataset.crs else None
+        return cls(dataset.read(1), dataset.transform, dataset.nodata, crs)
+
+    @staticmethod
+    def _source(path):
+        """(path, ext) open() reads: the converted .npy when it is up to date."""
+        stem, ext = os.path.splitext(path)
+        if ext.lower() != '.npy':
+            npy = stem + '.npy'
+            if (os.path.exists(npy) and os.path.exists(stem + '.json')
+                    and os.path.getmtime(npy) >= os.path.getmtime(path)):
+                return npy, '.npy'
+        return path, ext
+
+    @classmethod
+    def check(cls, path):
+        """
+        Raise DEMError unless `path` would open, reading only the headers
+        (the .npy header and .json sidecar, or the raster's metadata), not
+        the band.
+        """
+        try:
+            path, ext = cls._source(path)
+            if ext.lower() == '.npy':
+                with open(os.path.splitext(path)[0] + '.json', encoding='utf-8') as f:
+                    json.load(f)['transform']
+                band = np.load(path, mmap_mode='r')
+                if band.ndim != 2:
+                    raise ValueError(f"expected a 2-D band, got shape {band.shape}")
+                return
+            import rasterio as rio
+            with rio.open(path) as dataset:
+                if dataset.count < 1:
+                    raise ValueError("the raster has no bands")
+        except Exception as e:
+            raise DEMError(f"Cannot open DEM {path}: {e}") from e
+
+    @classmethod
+    def open(cls, path):
+        """
+        Open a DEM.  A .npy path is memory-mapped using its .json sidecar;
+        for a GeoTIFF, an up-to-date converted .npy next to it is used when
+        present, otherwise the band is read with rasterio.
+        """
+        path, ext = cls._source(path)
+        if ext.lower() == '.npy':
+            with open(os.path.splitext(path)[0] + '.json', encoding='utf-8') as f:
+                meta = json.load(f)
+            band = np.load(path, mmap_mode='r')
+            return cls(band, meta['transform'], meta.get('nodata'), meta.get('crs'))
+
+        import rasterio as rio
+        with rio.open(path) as dataset:
+            return cls.from_rasterio(dataset)
+
+
+class LazyDEM(object):
+    """
+    A DEM opened with DEM.open(path) the first time anything uses it.
+
+    Runs that never sample it (no IGC files, or every file read from the
+    fix cache) skip loading it.  Attributes and methods are those of the
+    DEM; load() opens it now, from any thread, once, and raises DEMError
+    when it cannot.  `seconds` is the time opening it took.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.seconds = 0.0
+        self._dem = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._dem is not None
+
+    def load(self):
+        if self._dem is None:
+            with self._lock:
+                if self._dem is None:
+                    t0 = time.perf_counter()
+                    try:
+                        self._dem = DEM.open(self.path)
+                    except Exception as e:
+                        raise DEMError(f"Cannot open DEM {self.path}: {e}") from e
+                    self.seconds = time.perf_counter() - t0
+        return self._dem
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+
+def convert_dem(src, dst=None):
+    """
+    Convert band 1 of a raster to <dst>.npy + <dst>.json (default: next to src).
+    The band is copied block by block, so the raster never has to fit in RAM.
+    Returns the .npy path.
+    """
+    import rasterio as rio
+
+    if dst is None:
+        dst = os.path.splitext(src)[0] + '.npy'
+    stem = os.path.splitext(dst)[0]
+    dst = stem + '.npy'
+    with rio.open(src) as dataset:
+        out = np.lib.format.open_memmap(dst + '.tmp', mode='w+',
+                                        dtype=dataset.dtypes[0],
+                                        shape=(dataset.height, dataset.width))
+        for _, window in dataset.block_windows(1):
+            r0, c0 = window.row_off, window.col_off
+            out[r0:r0 + window.height, c0:c0 + window.width] = dataset.read(1, window=window)
+        out.flush()
+        del out
+        meta = {
+            'source': os.path.basename(src),
+            'shape': [dataset.height, dataset.width],
+            'dtype': dataset.dtypes[0],
+            'transform': list(dataset.transform)[:6],
+            'nodata': dataset.nodata,
+            'crs': dataset.crs.to_string() if dataset.crs else None,
+        }
+    with open(stem + '.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(dst + '.tmp', dst)
+    return dst
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: dem_store.py conus.tif [conus.npy]")
+        sys.exit(0)
+    dst = convert_dem(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Wrote {dst} and {os.path.splitext(dst)[0] + '.json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Lazy discovery of IGC files.
+
+Walks the command line inputs with os.scandir and yields IGC files one
+at a time, so processing can start on the first file of an archive root
+with hundreds of thousands of logs instead of after a full listing:
+
+    for path in iter_igc_files(['wgc_unzipped_logs/', 'club2024.zip']):
+        ...
+
+The order is stable between runs: inputs in the order given, entries of
+each directory sorted by name, subdirectories walked depth first where
+they sort.  Extensions match case-insensitively (.igc, .IGC, .Igc).
+"""
+
+import os
+import zlib
+import tarfile
+import zipfile
+
+from archives import archive_members, is_archive
+
+
+def _walk(directory, recursive, on_error):
+    try:
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except OSError as e:
+        on_error(f"Cannot read directory {directory}: {e}")
+        return
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    yield from _walk(entry.path, recursive, on_error)
+            elif entry.name.lower().endswith('.igc') and entry.is_file():
+                yield entry.path
+        except OSError:
+            continue
+
+
+def _members(archive, on_error):
+    try:
+        return archive_members(archive)
+    # EOFError / zlib.error: a truncated or corrupt compressed tar
+    except (zipfile.BadZipFile, tarfile.TarError, OSError, EOFError, zlib.error) as e:
+        on_error(f"Cannot read archive {archive}: {e}")
+        return []
+
+
+def iter_igc_files(roots, recursive=True, on_empty=None, on_error=print):
+    """
+    Yield the absolute path of every IGC file under `roots` once.
+
+    A root can be a directory (walked recursively unless `recursive` is
+    false), a single .igc file, or a zip/tar archive whose .igc members
+    are yielded as archives.py member references.  A directory or archive
+    that cannot be read is skipped and `on_error(message)` called (by
+    default the message is printed).  `on_empty(root)` is called for
+    every root that held no IGC files.
+    """
+    seen = set()
+    for root in roots:
+        if os.path.isfile(root) and is_archive(root):
+            found = _members(os.path.abspath(root), on_error)
+        elif os.path.isfile(root):
+            found = [root] if root.lower().endswith('.igc') else []
+        else:
+            found = _walk(root, recursive, on_error)
+        n = 0
+        for path in found:
+            path = os.path.abspath(path)
+            if path in seen:
+                continue
+            seen.add(path)
+            n += 1
+            yield path
+        if n == 0 and on_empty is not None:
+            on_empty(root)
@@ -0,0 +1,255 @@
+"""
+Content-based detection of duplicate IGC files.
+
+The same flight often turns up more than once: one log copied into
+several directories or archives, or the primary and the backup logger of
+one glider.  Paths differ, so the path check of discovery.py lets them
+through and the flight is processed and reported twice.  Duplicates
+fingerprints each file cheaply before it is processed and skips files
+that hold a flight already seen:
+
+    dups = Duplicates()
+    for path in iter_igc_files(roots):
+        original = dups.check(path)
+        if original is not None:
+            print(f"Skipping {path}: same flight as {original}")
+            continue
+        ...
+
+A fingerprint is the HFDTE date, glider ID and type from the header plus
+a sample of the B records: the first and last fix and the first fix at
+or after every `step` seconds of the UTC day.  Plain files are memory-
+mapped and the samples found by bisecting on the byte offset, so only
+the header and a few pages per sample are read, not every fix.  Archive
+members are read whole.
+
+A file is a duplicate of one seen before when they have the same date,
+do not name different glider IDs or types, and either their sampled
+records are byte-identical (copies) or, for a trace that moves, the
+sampled positions are within `tol_m` metres of each other (median) over
+most of the later file's own trace (loggers recording the same glider at
+different rates).
+Only then is the later file skipped: a partial backup log seen first
+does not hide the complete log of the same flight, both are kept.
+"""
+
+import mmap
+import time
+import numpy as np
+
+from archives import read_source, split_member
+from geodist import distance_m
+from igc_header import Header, header_line
+
+# Bytes left to scan linearly once bisection has narrowed the range
+_SCAN = 4096
+
+# A trace whose samples stay within this many metres never left the ground
+_STILL_M = 1000.0
+
+
+class Fingerprint(object):
+    """
+    Header values and sampled B records of one IGC file.
+
+    `times` are the step times sampled, seconds from the start of the UTC
+    day of the first fix (past midnight they keep counting), except for
+    the first and last fix which keep their own time; `lat`/`lon` are the
+    positions of the sampled fixes, `records` their raw bytes.
+    """
+
+    __slots__ = ('path', 'fdate', 'gid', 'gtype', 'times', 'lat', 'lon', 'records')
+
+    def __init__(self, path, fdate, gid, gtype, times, lat, lon, records):
+        self.path = path
+        self.fdate = fdate
+        self.gid = gid
+        self.gtype = gtype
+        self.times = times
+        self.lat = lat
+        self.lon = lon
+        self.records = records
+
+    @property
+    def moves(self):
+        if len(self.lat) < 2:
+            return False
+        return float(distance_m(self.lat[0], self.lon[0], self.lat, self.lon).max()) > _STILL_M
+
+
+def _buffer(path):
+    """(buffer, closer): the file memory-mapped, or an archive member's bytes."""
+    if split_member(path)[1] is not None:
+        return read_source(path), None
+    f = open(path, 'rb')
+    try:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:  # empty file
+        f.close()
+        return b'', None
+    f.close()
+    return buf, buf
+
+
+def _record(buf, pos, end):
+    """
+    First valid B record starting after byte `pos` (and before `end`):
+    (start, stop, seconds, lat, lon, raw) or None.
+    """
+    while True:
+        s = buf.find(b'\nB', pos, end)
+        if s < 0:
+            return None
+        s += 1
+        e = buf.find(b'\n', s)
+        if e < 0:
+            e = len(buf)
+        raw = buf[s:e].rstrip(b'\r ')
+        pos = e - 1
+        if len(raw) < 24 or not (raw[1:14] + raw[15:23]).isdigit():
+            continue
+        if raw[14:15] not in (b'N', b'S') or raw[23:24] not in (b'E', b'W'):
+            continue
+        t = int(raw[1:3]) * 3600 + int(raw[3:5]) * 60 + int(raw[5:7])
+        lat = int(raw[7:9]) + int(raw[9:14]) / 60000.0
+        lon = int(raw[15:18]) + int(raw[18:23]) / 60000.0
+        if raw[14:15] == b'S':
+            lat = -lat
+        if raw[23:24] == b'W':
+            lon = -lon
+        return s, e, t, lat, lon, raw
+
+
+def _last_record(buf):
+    end = len(buf)
+    while end > 0:
+        s = buf.rfind(b'\nB', 0, end)
+        if s < 0:
+            return None
+        rec = _record(buf, s, end)
+        if rec is not None:
+            return rec
+        end = s
+    return None
+
+
+def fingerprint(path, step=300):
+    """Fingerprint of the IGC file (or archive member) `path`."""
+    buf, closer = _buffer(path)
+    try:
+        igc = Header()
+        first = _record(buf, 0, len(buf))
+        head = buf[:first[0] if first else min(len(buf), 1 << 16)]
+        for line in head.decode('utf-8', errors='ignore').splitlines():
+            line = line.strip()
+            if line[:1] == 'H':
+                header_line(igc, line)
+        samples = []
+        if first is not None:
+            last = _last_record(buf)
+            t0 = first[2]
+
+            def day_time(t):
+                return t if t >= t0 else t + 86400
+
+            samples.append((t0, first))
+            lo = first[1]
+            t_end = day_time(last[2])
+            t = (t0 // step + 1) * step
+            while t < t_end:
+                # Bisect on byte offsets for the first record at or after t
+                hi = last[0]
+                while hi - lo > _SCAN:
+                    mid = (lo + hi) // 2
+                    rec = _record(buf, mid, hi)
+                    if rec is None or day_time(rec[2]) >= t:
+                        hi = mid
+                    else:
+                        lo = rec[1]
+                rec = _record(buf, lo - 1, len(buf))
+                while rec is not None and day_time(rec[2]) < t:
+                    rec = _record(buf, rec[1] - 1, len(buf))
+                if rec is None:
+                    break
+                lo = rec[0]
+                rt = day_time(rec[2])
+                if rt - t < step:
+                    # Keyed by the step time, whatever the logger's fix rate
+                    samples.append((t, rec))
+                    t += step
+                else:
+                    # A gap in the trace: go on from the next step time after it
+                    t = -(-rt // step) * step
+            if last[0] != first[0]:
+                samples.append((day_time(last[2]), last))
+    finally:
+        if closer is not None:
+            closer.close()
+    return Fingerprint(
+        path, igc.fdate, igc.gid.upper(), igc.gtype.upper(),
+        np.array([t for t, _ in samples], dtype=np.int64),
+        np.array([r[3] for _, r in samples], dtype=float),
+        np.array([r[4] for _, r in samples], dtype=float),
+        tuple(r[5] for _, r in samples))
+
+
+def same_flight(a, b, tol_m=150.0, overlap=0.8):
+    """
+    True if fingerprint `b` holds the same flight as the earlier `a` and
+    adds nothing to it: `overlap` of b's samples must match (see the
+    module docstring).  Not symmetric; a short `a` never covers a long `b`.
+    """
+    if a.fdate != b.fdate:
+        return False
+    if a.gid != 'UNKNOWN' and b.gid != 'UNKNOWN' and a.gid != b.gid:
+        return False
+    if a.gtype != 'UNKNOWN' and b.gtype != 'UNKNOWN' and a.gtype != b.gtype:
+        return False
+    if not a.records or not b.records:
+        return False
+    if a.records == b.records:
+        return True
+    if not (a.moves and b.moves):
+        return False
+    # Samples taken at the same step times; the first and last fix are not aligned
+    common, ia, ib = np.intersect1d(a.times[1:-1], b.times[1:-1], return_indices=True)
+    if len(common) < 3 or len(common) < overlap * (len(b.times) - 2):
+        return False
+    d = distance_m(a.lat[1:-1][ia], a.lon[1:-1][ia], b.lat[1:-1][ib], b.lon[1:-1][ib])
+    return float(np.median(d)) <= tol_m
+
+
+class Duplicates(object):
+    """
+    Fingerprints of the files seen so far, by flight date.
+
+    check() is called from one thread; `found` lists (path, original) for
+    every duplicate, `seconds` the time spent fingerprinting.
+    """
+
+    def __init__(self, step=300, tol_m=150.0):
+        self.step = step
+        self.tol_m = tol_m
+        self.by_date = {}
+        self.found = []
+        self.seconds = 0.0
+
+    def check(self, path):
+        """
+        Path of an earlier file holding the same flight as `path`, or None
+        (also when `path` cannot be read; processing reports that).
+        """
+        t0 = time.perf_counter()
+        try:
+            fp = fingerprint(path, self.step)
+        except (OSError, KeyError):
+            return None
+        finally:
+            self.seconds += time.perf_counter() - t0
+        seen = self.by_date.setdefault(fp.fdate, [])
+        for other in seen:
+            if same_flight(other, fp, self.tol_m):
+                self.found.append((path, other.path))
+                return other.path
+        seen.append(fp)
+        return None
@@ -0,0 +1,109 @@
+"""
+Columnar engine-run event output.
+
+The CSV reports engine runs and MOP/ENL detections as sentences that the
+notebooks regex-parse back out.  This writes the same detections as one
+typed row per event instead, so all years load with a single read:
+
+    df = pd.read_parquet('events.parquet')
+    df[(df.gtype == 'JS-3-18m') & (df.kind == 'sweep') & (df.agl_start_ft < 500)]
+    df[(df.date >= date(2024, 8, 1)) & (df.start_time < 12 * 3600)]
+
+kind is 'engine' (the run reported in "Sensor Info"), 'enl' (ENL motor
+noise) or 'sweep' (one of the "Sensor Info (...)" threshold pairs).
+date is the flight date (Parquet date32; YYYY-MM-DD in a CSV, empty when
+the log has none).  start_time and end_time are integer seconds from
+00:00 UTC of the takeoff's day, counting on past 86400 after midnight
+(see timeaxis.py); an event still on when the flight ended is closed at
+the last fix.  In event tuples (and the manifest) the date is kept as
+its YYYY-MM-DD string or None.
+"""
+
+import csv
+from datetime import date
+
+from flight_db import iso_date
+from timeaxis import DAY, hms_seconds
+
+# (name, type) of every event column, in order
+COLUMNS = [
+    ('file', str),
+    ('flight', int),
+    ('date', date),
+    ('gtype', str),
+    ('kind', str),
+    ('sensor', str),
+    ('on', int),
+    ('off', int),
+    ('start_time', int),
+    ('end_time', int),
+    ('duration_s', int),
+    ('msl_start_ft', float),
+    ('agl_start_ft', float),
+    ('height_gain_ft', float),
+]
+NAMES = [name for name, _ in COLUMNS]
+
+FORMATS = ('.parquet', '.csv')
+
+
+def check_path(path):
+    """
+    Raise ValueError if events cannot be written to `path`
+    (unknown extension, or Parquet without pyarrow installed).
+    """
+    if not path.lower().endswith(FORMATS):
+        raise ValueError(f"Events file must end in {' or '.join(FORMATS)}: {path}")
+    if path.lower().endswith('.parquet'):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Writing .parquet events needs pyarrow; "
+                             "install it or use a .csv events file")
+
+
+def event_rows(flight):
+    """
+    Event tuples (in COLUMNS order) for every EngineRun of a flights.Flight.
+    """
+    t0 = hms_seconds(flight.takeoff)
+
+    def seconds(hms):
+        # Runs never start before the takeoff, so an earlier time is past midnight
+        s = hms_seconds(hms)
+        return s + DAY if s < t0 else s
+
+    return [(flight.file, flight.index, iso_date(flight.date), flight.gtype, run.kind,
+             run.sensor, run.on, run.off, seconds(run.start),
+             seconds(run.start) + run.duration_s, run.duration_s,
+             round(float(run.msl_start_ft), 1), round(float(run.agl_start_ft), 1),
+             float(run.height_gain_ft))
+            for run in flight.engine_runs]
+
+
+def write_events(path, events):
+    """
+    Write event tuples (in COLUMNS order) to a .parquet or .csv file.
+    """
+    check_path(path)
+    events = list(events)
+    if path.lower().endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {str: pa.string(), int: pa.int64(), float: pa.float64(),
+                 date: pa.date32()}
+        schema = pa.schema([(name, types[t]) for name, t in COLUMNS])
+        cols = list(zip(*events)) if events else [[] for _ in COLUMNS]
+        i = NAMES.index('date')
+        cols[i] = [date.fromisoformat(v) if v else None for v in cols[i]]
+        table = pa.Table.from_arrays(
+            [pa.array(list(col), type=schema.field(i).type) for i, col in enumerate(cols)],
+            schema=schema)
+        pq.write_table(table, path)
+        return
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(NAMES)
+        writer.writerows(events)
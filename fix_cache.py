@@ -0,0 +1,104 @@
+"""
+Binary cache of parsed IGC fixes.
+
+Rerunning the engine with new thresholds or rules parses every IGC file
+and samples the DEM for every fix again.  FixCache keeps, per IGC file,
+the fixes read_igc() kept plus the DEM ground height of each fix in one
+structured .npy (one record per fix) and the header values in a .json
+sidecar, like dem_store does for the DEM.  Later runs memory-map the .npy
+instead of parsing the text:
+
+    cache = FixCache('fixcache', dem_key('conus.tif'))
+    igc = cache.read('4536-9239003146.igc', dem)
+    igc.fixes['ground']           # float64 ground height (m), 0 off the DEM
+
+An entry is rebuilt when the IGC file's size or mtime changes (for an
+archive member its own size, mtime and CRC-32, not the archive's), when
+the DEM is a different one, or when the cache format changes.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+
+from archives import source_name, stat_source
+from igc_parser import IGCFile, read_igc
+
+VERSION = 3
+
+
+def dem_key(path):
+    """Identity of a DEM file: absolute path, size and mtime."""
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+class FixCache(object):
+    """
+    Directory of cached fixes, one <name>-<hash>.npy/.json pair per IGC file.
+
+    Holds no DEM itself (it is small enough to hand to worker processes);
+    `dem_key` identifies the DEM passed to read().
+    """
+
+    def __init__(self, directory, dem_key=''):
+        self.directory = directory
+        self.dem_key = dem_key
+        os.makedirs(directory, exist_ok=True)
+
+    def stem(self, path):
+        path = os.path.abspath(path)
+        h = hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.directory, f"{source_name(path)}-{h}")
+
+    def _stamp(self, path):
+        st = stat_source(path)
+        return {'version': VERSION, 'size': st.st_size, 'mtime': st.st_mtime_ns,
+                'crc': getattr(st, 'crc', None), 'dem': self.dem_key}
+
+    def read(self, path, dem):
+        """
+        IGCFile for `path` with a 'ground' fix column, from the cache when
+        it is up to date, otherwise parsed, sampled on `dem` and stored.
+        """
+        stem = self.stem(path)
+        stamp = self._stamp(path)
+        try:
+            with open(stem + '.json', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['stamp'] == stamp:
+                return self._load(stem, meta)
+        except (OSError, ValueError, KeyError):
+            pass
+        igc = read_igc(path)
+        igc.fixes['ground'] = dem.sample(igc.fixes['lat'], igc.fixes['lon'], fill=0)
+        self._store(stem, stamp, igc)
+        return igc
+
+    def _load(self, stem, meta):
+        arr = np.load(stem + '.npy', mmap_mode='r')
+        igc = IGCFile()
+        for name in ('gtype', 'fdate', 'gid', 'cid', 'pilot', 'blen', 'nbad', 'sha1'):
+            setattr(igc, name, meta[name])
+        igc.extensions = {tag: tuple(span) for tag, span in meta['extensions']}
+        igc.fixes = {name: arr[name] for name in arr.dtype.names}
+        return igc
+
+    def _store(self, stem, stamp, igc):
+        names = list(igc.fixes)
+        arr = np.empty(len(igc), dtype=[(name, igc.fixes[name].dtype) for name in names])
+        for name in names:
+            arr[name] = igc.fixes[name]
+        meta = {name: getattr(igc, name)
+                for name in ('gtype', 'fdate', 'gid', 'cid', 'pilot', 'blen', 'nbad',
+                             'sha1')}
+        meta['extensions'] = [[tag, list(span)] for tag, span in igc.extensions.items()]
+        meta['stamp'] = stamp
+        # .npy first, the .json marks the entry complete
+        with open(stem + '.npy.tmp', 'wb') as f:
+            np.save(f, arr)
+        os.replace(stem + '.npy.tmp', stem + '.npy')
+        with open(stem + '.json.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(stem + '.json.tmp', stem + '.json')
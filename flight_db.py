@@ -0,0 +1,132 @@
+"""
+SQLite index of flights and engine runs.
+
+With --db PATH the engine keeps every flight it finds, and every engine
+run / sensor event of it, in an indexed SQLite database, so fleet
+questions no longer need every year's CSV loaded and regex-parsed:
+
+    db = FlightDB('flights.sqlite')
+    db.query('''SELECT file, takeoff, start_time, agl_start_ft FROM runs
+                WHERE gtype = ? AND kind = 'engine' AND agl_start_ft < 500
+                  AND date BETWEEN '2024-01-01' AND '2024-12-31' ''', ('JS-3-18m',))
+
+    pd.read_sql('SELECT * FROM runs WHERE sensor = "MOP"', sqlite3.connect('flights.sqlite'))
+
+Tables: files (one row per IGC file processed), flights (one per
+flight), engine_runs (one per EngineRun); the runs view joins each run
+to its flight.  Dates are stored as ISO YYYY-MM-DD.  Writing a file
+replaces everything stored for it before (upsert keyed on file).
+"""
+
+import time
+import sqlite3
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    file            TEXT PRIMARY KEY,
+    name            TEXT,
+    flights         INTEGER,
+    processed_at    REAL
+);
+CREATE TABLE IF NOT EXISTS flights (
+    id              INTEGER PRIMARY KEY,
+    file            TEXT NOT NULL REFERENCES files(file) ON DELETE CASCADE,
+    flight          INTEGER NOT NULL,
+    name            TEXT,
+    date            TEXT,
+    gtype           TEXT,
+    sensor          TEXT,
+    takeoff         TEXT,
+    landing         TEXT,
+    landed          INTEGER,
+    flight_time     TEXT,
+    landing_class   TEXT,
+    start_alt_ft    INTEGER,
+    max_msl_ft      INTEGER,
+    max_agl_ft      INTEGER,
+    UNIQUE (file, flight)
+);
+CREATE TABLE IF NOT EXISTS engine_runs (
+    flight_id       INTEGER NOT NULL REFERENCES flights(id) ON DELETE CASCADE,
+    kind            TEXT,
+    sensor          TEXT,
+    on_threshold    INTEGER,
+    off_threshold   INTEGER,
+    start_time      TEXT,
+    end_time        TEXT,
+    closed          INTEGER,
+    duration_s      INTEGER,
+    msl_start_ft    REAL,
+    agl_start_ft    REAL,
+    height_gain_ft  REAL
+);
+CREATE INDEX IF NOT EXISTS flights_gtype ON flights (gtype, date);
+CREATE INDEX IF NOT EXISTS flights_date ON flights (date);
+CREATE INDEX IF NOT EXISTS flights_landing ON flights (landing_class);
+CREATE INDEX IF NOT EXISTS runs_flight ON engine_runs (flight_id);
+CREATE INDEX IF NOT EXISTS runs_sensor ON engine_runs (sensor, kind, on_threshold);
+CREATE VIEW IF NOT EXISTS runs AS
+    SELECT f.file, f.name, f.flight, f.date, f.gtype, f.takeoff, f.landing,
+           f.landing_class, r.*
+    FROM engine_runs r JOIN flights f ON f.id = r.flight_id;
+'''
+
+
+def iso_date(fdate):
+    """'08/28/2024' -> '2024-08-28'; None for 'Unknown' or anything else."""
+    parts = fdate.split('/')
+    if len(parts) != 3 or not all(p.isdigit() for p in parts):
+        return None
+    return f"{parts[2]}-{parts[0]}-{parts[1]}"
+
+
+class FlightDB(object):
+    """
+    Flights and engine runs in SQLite.  Not thread-safe: one writer
+    (the main thread of the CLI) per connection.
+    """
+
+    def __init__(self, path, timeout=60):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=timeout)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def upsert_file(self, file, flights):
+        """Replace whatever is stored for `file` with `flights` (flights.Flight)."""
+        flights = list(flights)
+        with self.conn:
+            self.conn.execute('DELETE FROM files WHERE file = ?', (file,))
+            self.conn.execute('INSERT INTO files VALUES (?, ?, ?, ?)',
+                              (file, flights[0].file if flights else None,
+                               len(flights), time.time()))
+            for fl in flights:
+                cur = self.conn.execute(
+                    'INSERT INTO flights (file, flight, name, date, gtype, sensor, takeoff, '
+                    'landing, landed, flight_time, landing_class, start_alt_ft, max_msl_ft, '
+                    'max_agl_ft) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (file, fl.index, fl.file, iso_date(fl.date), fl.gtype, fl.sensor,
+                     fl.takeoff, fl.landing, int(fl.landed), fl.flight_time.strip(),
+                     fl.landing_class, fl.start_alt_ft, fl.max_msl_ft, fl.max_agl_ft))
+                fid = cur.lastrowid
+                self.conn.executemany(
+                    'INSERT INTO engine_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(fid, r.kind, r.sensor, r.on, r.off, r.start, r.end, int(r.closed),
+                      r.duration_s, round(float(r.msl_start_ft), 1),
+                      round(float(r.agl_start_ft), 1), float(r.height_gain_ft))
+                     for r in fl.engine_runs])
+
+    def delete_file(self, file):
+        with self.conn:
+            self.conn.execute('DELETE FROM files WHERE file = ?', (file,))
+
+    def files(self):
+        return [row[0] for row in self.conn.execute('SELECT file FROM files ORDER BY file')]
+
+    def query(self, sql, params=()):
+        return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,551 @@
+"""
+Flight and engine-run detection.
+
+iter_flights() runs the fix filters and takeoff/landing logic of the
+original c_time loop over one IGC file and yields a Flight per flight found,
+without printing anything or touching the CSV files:
+
+    dem = DEM.open('conus.tif')
+    for flight in iter_flights('4536-9239003146.igc', dem):
+        flight.takeoff, flight.landing, flight.landing_class
+        flight.max_msl_ft, flight.max_agl_ft
+        for run in flight.runs('engine'):
+            run.start, run.duration_s, run.agl_start_ft, run.height_gain_ft
+
+iter_events() runs the same detection over fixes as they arrive from a
+log still being written (see live.py) and yields FlightEvents (takeoff,
+engine on/off, landing) as soon as they are confirmed.
+
+Flight and EngineRun use __slots__ so large numbers of them stay small.
+Times are HHMMSS strings and altitudes feet, as in the CSV.
+"""
+
+import os
+import time
+
+import numpy as np
+
+from archives import source_name
+from igc_parser import IGCFile, read_igc
+from geodist import distance_m, step_distances
+from sensor_sweep import ENGINE_PAIRS, ENL_PAIR, sweep, sweep_sensors
+from timeaxis import DAY, duration, hms_seconds
+
+# Threshold values for MOP sensor
+thresholds = [300, 400, 500, 600, 700]
+
+# (on, off) threshold pairs swept per sensor, one "Sensor Info (...)" CSV
+# column each; override with --sweep SENSOR:ON/OFF[,ON/OFF...]
+SWEEP = {'MOP': [(t, 50) for t in thresholds]}
+
+S2H = 3600
+M2F = 3.28084
+K2M = .621371
+
+# Distance (m) between the first and last fix beyond which a landing is LOUT
+HOME_RADIUS = 1500
+
+
+class EngineRun(object):
+    """
+    One interval during which a sensor stayed above its `on` threshold.
+
+    kind is 'engine' (the run reported in "Sensor Info"), 'enl' (ENL motor
+    noise) or 'sweep' (one of the swept threshold pairs).  A run that was
+    still on when the flight ended has closed False and ends at the last fix.
+    """
+
+    __slots__ = ('kind', 'sensor', 'on', 'off', 'start', 'end', 'closed',
+                 'msl_start_ft', 'agl_start_ft', 'msl_end_ft', 'agl_end_ft')
+
+    def __init__(self, kind, sensor, on, off, start, end, closed,
+                 msl_start_ft, agl_start_ft, msl_end_ft, agl_end_ft):
+        self.kind = kind
+        self.sensor = sensor
+        self.on = on
+        self.off = off
+        self.start = start
+        self.end = end
+        self.closed = closed
+        self.msl_start_ft = msl_start_ft
+        self.agl_start_ft = agl_start_ft
+        self.msl_end_ft = msl_end_ft
+        self.agl_end_ft = agl_end_ft
+
+    @property
+    def duration_s(self):
+        return (hms_seconds(self.end) - hms_seconds(self.start)) % DAY
+
+    @property
+    def height_gain_ft(self):
+        return int(self.msl_end_ft) - int(self.msl_start_ft)
+
+    def __repr__(self):
+        return (f"EngineRun({self.kind} {self.sensor} {self.on}/{self.off} "
+                f"{self.start}-{self.end})")
+
+
+class Flight(object):
+    """
+    One flight found in an IGC file.
+
+        file          short file name
+        index         0-based number of the flight within the file
+        date, gtype   header values, as in the CSV
+        sensor        engine sensor used for the 'engine' runs ('' if none)
+        takeoff       HHMMSS of the fix where the flight started
+        landing       HHMMSS of the landing fix, or of the last fix when
+                      landed is False (trace ended in the air)
+        flight_time   H:MM:SS string, as in the CSV
+        landing_class 'HOME' or 'LOUT' ('AWAY' too with airfields.py)
+        start_alt_ft  MSL altitude at the start of the trace
+        max_msl_ft, max_agl_ft
+        start_pos, end_pos
+                      (lat, lon) of the first fix and of the fix before
+                      the landing fix, used for the landing class
+        engine_runs   tuple of EngineRun
+        trace         per-fix columns (see traces.py) when asked for, else None
+        takeoff_field, landing_field
+                      (name, metres) of the nearest known field once
+                      airfields.Airfields.classify() ran, else None
+    """
+
+    __slots__ = ('file', 'index', 'date', 'gtype', 'sensor', 'takeoff', 'landing',
+                 'landed', 'flight_time', 'landing_class', 'start_alt_ft',
+                 'max_msl_ft', 'max_agl_ft', 'start_pos', 'end_pos', 'engine_runs',
+                 'trace', 'takeoff_field', 'landing_field')
+
+    def __init__(self, **kw):
+        for name in ('trace', 'takeoff_field', 'landing_field'):
+            kw.setdefault(name, None)
+        for name in self.__slots__:
+            setattr(self, name, kw[name])
+
+    @property
+    def year(self):
+        return self.date.split('/')[-1]
+
+    def runs(self, kind=None, sensor=None, on=None, off=None):
+        """Engine runs matching the given kind / sensor / thresholds."""
+        return [r for r in self.engine_runs
+                if (kind is None or r.kind == kind) and
+                   (sensor is None or r.sensor == sensor) and
+                   (on is None or r.on == on) and (off is None or r.off == off)]
+
+    def __repr__(self):
+        return (f"Flight({self.file} #{self.index} {self.date} "
+                f"{self.takeoff}-{self.landing} {self.landing_class})")
+
+
+class FlightEvent(object):
+    """
+    Something iter_events() saw happen: kind is 'takeoff', 'engine_on',
+    'engine_off', 'landing' or 'end' (the trace stopped in the air).
+
+    `time` is HHMMSS, msl_ft/agl_ft and lat/lon where it happened, `index`
+    the flight's number within the file; `sensor` is set for the engine
+    events and `flight` (the finished Flight) for landing and end.
+    """
+
+    __slots__ = ('kind', 'file', 'index', 'time', 'lat', 'lon', 'msl_ft', 'agl_ft',
+                 'sensor', 'flight')
+
+    def __init__(self, kind, file, index, time, lat, lon, msl_ft, agl_ft, sensor='',
+                 flight=None):
+        self.kind = kind
+        self.file = file
+        self.index = index
+        self.time = time
+        self.lat = lat
+        self.lon = lon
+        self.msl_ft = msl_ft
+        self.agl_ft = agl_ft
+        self.sensor = sensor
+        self.flight = flight
+
+    def __repr__(self):
+        return f"FlightEvent({self.kind} {self.file} #{self.index} {self.time})"
+
+
+def _source_name(source):
+    if isinstance(source, str):
+        return source_name(source)
+    return os.path.basename(getattr(source, 'name', '') or '')
+
+
+def _runs(kind, sensor, on, off, marks, end):
+    """EngineRuns from [(time, msl, agl), ...] transition marks [on, off, ...]."""
+    out = []
+    for i in range(0, len(marks), 2):
+        closed = i + 1 < len(marks)
+        stop = marks[i+1] if closed else end
+        out.append(EngineRun(kind, sensor, on, off, marks[i][0], stop[0], closed,
+                             marks[i][1], marks[i][2], stop[1], stop[2]))
+    return out
+
+
+def engine_runs(fx, proc, sensor, sweep_grid, end, filt=None):
+    """
+    Engine runs, ENL noise and threshold sweep runs for one flight.
+
+    `proc` holds, for every fix of the flight that reached the sensor
+    logic, its index into the `fx` columns, whether the flight had started
+    (armed), its time, MSL, AGL and speed, and the takeoff fix to report instead
+    when the engine comes on right after takeoff.  `end` is the
+    (time, msl, agl) of the last fix, where runs still on are closed.  All
+    hysteresis pairs run through sensor_sweep.sweep(), one vectorized pass
+    per sensor column.  A sensor_sweep.SensorFilter as `filt` smooths the
+    columns before and drops short runs after.
+    """
+    idx = np.asarray(proc['k'], dtype=np.intp)
+    armed = np.asarray(proc['armed'], dtype=bool)
+    times = proc['time']
+    msl = proc['msl']
+    agl = proc['agl']
+    runs = []
+    secs = np.asarray(fx['secs'])[idx] if filt is not None else None
+    columns = {}
+
+    def column(tag):
+        if tag not in columns:
+            columns[tag] = fx[tag][idx]
+            if filt is not None:
+                columns[tag] = filt.column(columns[tag], secs)
+        return columns[tag]
+
+    def transitions(trans):
+        return filt.runs(trans, secs) if filt is not None else trans
+
+    # ENL/RPM/MOP engine run logic
+    if sensor:
+        on, off = ENGINE_PAIRS[sensor]
+        marks = []
+        trans = transitions(sweep(column(sensor), [(on, off)], armed)[0])
+        for j, i in enumerate(trans.tolist()):
+            if j % 2 == 0 and proc['takeoff'][i] is not None:
+                marks.append(proc['takeoff'][i])
+            else:
+                marks.append((times[i], msl[i], agl[i]))
+        runs += _runs('engine', sensor, on, off, marks, end)
+
+    # ENL fallback when there is no RPM sensor
+    if 'ENL' in fx and 'RPM' not in fx:
+        on, off = ENL_PAIR
+        trans = transitions(sweep(column('ENL'), [ENL_PAIR], armed)[0]).tolist()
+        runs += _runs('enl', 'ENL', on, off,
+                      [(times[i], msl[i], agl[i]) for i in trans], end)
+
+    # Threshold sweep
+    cols = {tag: column(tag) for tag in sweep_grid if tag in fx}
+    found = sweep_sensors(cols, sweep_grid, armed)
+    for sensor_, pairs in sweep_grid.items():
+        for on, off in pairs:
+            trans = transitions(found.get((sensor_, on, off), []))
+            runs += _runs('sweep', sensor_, on, off,
+                          [(times[i], msl[i], agl[i]) for i in trans], end)
+    return tuple(runs)
+
+
+def _reject_rule(valid, dist, hhmmss, press, bpress, bcnt):
+    """Name of the first fix filter rule that rejects a fix (see iter_flights)."""
+    if not valid:
+        return 'reject_invalid'
+    if int(dist) > 5000:
+        return 'reject_jump'
+    if hhmmss % 100 == 60:
+        return 'reject_sec60'
+    if press < -500:
+        return 'reject_press_low'
+    if press == 0:
+        return 'reject_press_zero'
+    return 'reject_press_step'
+
+
+def iter_flights(source, dem, dist_method='local', sweep_grid=None, name=None,
+                 stats=None, trace=None, filt=None):
+    """
+    Yield a Flight for every flight found in one IGC file.
+
+    `source` is a path, an open binary file, the raw bytes or an IGCFile
+    already read with igc_parser.read_igc() or fix_cache.FixCache.read()
+    (whose ground heights are used as they are).  `dem` is a dem_store.DEM,
+    `dist_method` one of geodist.METHODS and `sweep_grid` maps sensors to
+    the (on, off) pairs to report as 'sweep' runs (default SWEEP).  `name`
+    is the file name to report, by default the basename of the source.
+    A profiling.FileStats as `stats` collects stage times and counters.
+    With a traces.TraceExport as `trace` each Flight gets its downsampled
+    per-fix trace as flight.trace.  A sensor_sweep.SensorFilter as `filt`
+    filters sensor noise around the engine hysteresis (see engine_runs).
+    """
+    sweep_grid = SWEEP if sweep_grid is None else sweep_grid
+    if name is None:
+        name = _source_name(source)
+    t0 = time.perf_counter()
+    igc = source if isinstance(source, IGCFile) else read_igc(source)
+    if stats is not None:
+        if not isinstance(source, IGCFile):
+            stats.add_time('parse', time.perf_counter() - t0)
+        stats.count('fixes', len(igc))
+        stats.count('bad_records', igc.nbad)
+    yield from _detect(igc, (igc.fixes,), dem, dist_method, sweep_grid, name, stats,
+                       trace=trace, filt=filt)
+
+
+def iter_events(igc, chunks, dem, dist_method='local', sweep_grid=None, name=''):
+    """
+    Yield FlightEvents as fixes arrive, for following a log being written.
+
+    `chunks` yields fix columns (as igc_parser.IGCStream.feed() returns
+    them) and may block until more arrive; `igc` is the IGCFile whose
+    header values are reported, the stream's own while it fills.  The
+    detection is the one iter_flights() runs: takeoff is reported at the
+    fix where the flight starts, engine_on/engine_off at the fix where the
+    engine sensor crosses its threshold pair, landing when the stop is
+    confirmed (event.flight is the Flight iter_flights() would yield) and
+    'end' with the Flight of a trace that stopped in the air.
+    """
+    sweep_grid = SWEEP if sweep_grid is None else sweep_grid
+    yield from _detect(igc, chunks, dem, dist_method, sweep_grid, name, None, live=True)
+
+
+def _detect(igc, chunks, dem, dist_method, sweep_grid, name, stats, live=False,
+            trace=None, filt=None):
+    """
+    The fix filters and takeoff/landing state machine, run over `chunks`
+    of fix columns.  Yields Flights, or FlightEvents when `live`.  Being a
+    generator, the state carries over from one chunk to the next.
+    """
+    clock = time.perf_counter
+    hhmmss = []
+    secs = []
+    lats = []
+    lons = []
+    valid = []
+    press = []
+    latdeg = []
+    gspcol = None
+    ground = []
+    ground_ft = []
+    steps = []
+    sensval = []
+    parts = []
+    sensor = ''
+
+    def columns():
+        # Fix columns of every chunk so far, for the sensor logic
+        if len(parts) > 1:
+            parts[:] = [{tag: np.concatenate([c[tag] for c in parts]) for tag in parts[0]}]
+        return parts[0]
+
+    def flight(stop, stop_s, landed):
+        if stats is not None:
+            stats.add_time('detect', clock() - t_loop)
+            stats.count('fixes_used', len(proc['k']))
+            stats.count('flights')
+            t0 = clock()
+        ldist = distance_m(spnt[0], spnt[1], bpnt[0], bpnt[1], dist_method)
+        fx = columns()
+        runs = engine_runs(fx, proc, sensor, sweep_grid, (atime, mslalt, aglalt), filt)
+        fl = Flight(
+            file=name, index=nflight, date=str(igc.fdate), gtype=str(igc.gtype),
+            sensor=sensor, takeoff=start, landing=stop, landed=landed,
+            flight_time=duration(stop_s - start_s),
+            landing_class="LOUT" if ldist > HOME_RADIUS else "HOME",
+            start_alt_ft=int(M2F*int(spress)), max_msl_ft=int(M2F*int(mpress)),
+            max_agl_ft=int(maxaglalt), start_pos=spnt, end_pos=bpnt,
+            engine_runs=runs,
+            trace=trace.build(fx, proc, runs) if trace is not None else None)
+        if stats is not None:
+            stats.add_time('sensors', clock() - t0)
+        return fl
+
+    def event(kind, mark=None, flight=None):
+        mark = mark or (atime, mslalt, aglalt)
+        return FlightEvent(kind, name, nflight, mark[0], lats[p], lons[p],
+                           mark[1], mark[2], sensor if kind.startswith('engine') else '',
+                           flight)
+
+    atime = apress = 0
+    spd = start = start_s = st = spress = bcnt = mpress = dpress = 0
+    proc = {'k': [], 'armed': [], 'time': [], 'msl': [], 'agl': [], 'spd': [],
+            'takeoff': []}
+    maxaglalt = aglalt = mslalt = 0
+    sginit = demalt = dist = 0
+    spnt = bpnt = (0.0, 0.0)
+    nflight = 0
+    engine_on = False
+
+    p = -1  # index of the previous fix, -1 at the start of a flight
+    for fx in chunks:
+        if len(fx['time']) == 0:
+            continue
+        if not parts:
+            # Engine sensor from the I record, RPM preferred over MOP over ENL
+            for tag in ('ENL', 'MOP', 'RPM'):
+                if tag in igc.extensions:
+                    sensor = tag
+            if 'GSP' in fx:
+                gspcol = []
+            on_thr, off_thr = ENGINE_PAIRS.get(sensor, (0, 0))
+        parts.append(fx)
+        base = len(hhmmss)
+        hhmmss += fx['hhmmss'].tolist()
+        secs += fx['secs'].tolist()
+        lats += fx['lat'].tolist()
+        lons += fx['lon'].tolist()
+        valid += fx['valid'].tolist()
+        press += fx['press'].tolist()
+        latdeg += np.abs(fx['lat']).astype(int).tolist()
+        if gspcol is not None:
+            gspcol += fx['GSP'].tolist()
+        if live and sensor:
+            sensval += fx[sensor].tolist()
+
+        # Ground elevation for every fix in one lookup, 0 outside the DEM;
+        # fix_cache.FixCache stores it with the fixes as a 'ground' column
+        t0 = clock()
+        if 'ground' in fx:
+            ground_m = np.asarray(fx['ground'])
+        else:
+            ground_m = dem.sample(fx['lat'], fx['lon'], fill=0)
+        ground += ground_m.tolist()
+        ground_ft += (M2F*ground_m).astype(int).tolist()
+        if stats is not None:
+            stats.count('dem_outside', int((~dem.contains(fx['lat'], fx['lon'])).sum()))
+            stats.add_time('dem', clock() - t0)
+
+        # Distance from each fix to the one before it, for the jump filter and speed
+        t0 = clock()
+        steps += step_distances(fx['lat'], fx['lon'], dist_method).tolist()
+        if base:
+            steps[base] = float(distance_m(lats[base-1], lons[base-1], lats[base], lons[base],
+                                           dist_method))
+        if stats is not None:
+            stats.add_time('distance', clock() - t0)
+        t_loop = clock()
+
+        for k in range(base, len(hhmmss)):
+            if (hhmmss[k] == 0) or (latdeg[k] == 0) or (latdeg[k] > 90):
+                if stats is not None:
+                    stats.count('reject_time' if hhmmss[k] == 0 else 'reject_lat')
+                continue
+            bcnt = bcnt + 1
+            alat = lats[k]
+            alon = lons[k]
+            if p == k - 1:
+                dist = steps[k]
+            elif p >= 0:
+                # Fixes were skipped since the previous one
+                dist = float(distance_m(lats[p], lons[p], alat, alon, dist_method))
+            else:
+                dist = 0
+            bpress = apress
+            if ((not valid[k]) or (int(dist) > 5000) or (hhmmss[k] % 100 == 60) or
+                (press[k] < -500) or (press[k] == 0) or
+                ((abs(int(bpress)-press[k])) > 800 and bcnt > 1)):
+                if stats is not None:
+                    stats.count(_reject_rule(valid[k], dist, hhmmss[k], press[k], bpress, bcnt))
+                bcnt = bcnt - 1
+                continue
+            b = p
+            p = k
+            atime = '%06d' % hhmmss[k]
+            bpnt = (lats[b], lons[b]) if b >= 0 else (0.0, 0.0)
+            if (bcnt == 1):
+                # Surface height and altitude offset at the start
+                demalt = ground[k]
+                dpress = press[k] - int(demalt)
+                if (int(dpress) > 150):
+                    dpress = 0
+                spnt = (alat, alon)
+            apress = press[k] - int(dpress)
+            if int(apress) > int(mpress):
+                mpress = apress
+            if ((sginit == 0) and (int(apress) > 0)):
+                if dpress == 0:
+                    spress = demalt
+                else:
+                    spress = apress
+                sginit = 1
+            if b >= 0:
+                dsec = secs[k] - secs[b]
+                if dsec == 0:
+                    if stats is not None:
+                        stats.count('reject_same_time')
+                    continue
+            else:
+                dsec = 1
+            pspd = spd
+            if gspcol is not None:
+                spd = gspcol[k] * K2M
+            else:
+                spd = (dist / dsec) * M2F / 5280 * S2H if dsec != 0 else 0
+            if (spd > (15*pspd)) and pspd != 0:
+                if stats is not None:
+                    stats.count('reject_speed_spike')
+                continue
+            mslalt = M2F*float(apress)
+            demalt = ground_ft[k]  # 0 when off the DEM
+            aglalt = mslalt - demalt
+            if aglalt > maxaglalt:
+                maxaglalt = aglalt
+
+            # Sensor logic runs over these fixes once the flight ends
+            proc['k'].append(k)
+            proc['armed'].append(start != 0)
+            proc['time'].append(atime)
+            proc['msl'].append(mslalt)
+            proc['agl'].append(aglalt)
+            proc['spd'].append(spd)
+            if (b >= 0 and '%06d' % hhmmss[b] == start):
+                proc['takeoff'].append((start, M2F*float(bpress), M2F*float(bpress) - demalt))
+            else:
+                proc['takeoff'].append(None)
+
+            # The engine hysteresis of engine_runs(), one fix at a time
+            if live and sensor:
+                if not engine_on and start != 0 and sensval[k] > on_thr:
+                    engine_on = True
+                    yield event('engine_on', proc['takeoff'][-1])
+                elif engine_on and sensval[k] < off_thr:
+                    engine_on = False
+                    yield event('engine_off')
+
+            # Detect flight start
+            if spd >= 35:
+                if start == 0:
+                    start = atime
+                    start_s = secs[k]
+                    if live:
+                        yield event('takeoff')
+
+            if b < 0:
+                continue
+
+            # Detect flight stop: the sixth slow, low fix in a row.  Only
+            # accepted B fixes count; the line-by-line original also counted
+            # the K, F, E and L lines in between, which landed earlier
+            if ((spd <= 15) and (aglalt <= 200) and (start != 0)):
+                st = st + 1
+                if st <= 5:
+                    continue
+                fl = flight(atime, secs[k], True)
+                yield event('landing', flight=fl) if live else fl
+                t_loop = clock()
+                nflight += 1
+
+                # Reset variables for next flight
+                atime = apress = 0
+                p = -1
+                spd = start = st = spress = bcnt = mpress = sginit = 0
+                proc = {'k': [], 'armed': [], 'time': [], 'msl': [], 'agl': [], 'spd': [],
+                        'takeoff': []}
+                maxaglalt = aglalt = 0
+                engine_on = False
+
+    # End of trace with no stop found, report the flight anyway
+    if start != 0:
+        fl = flight(atime, secs[p], False)
+        yield event('end', flight=fl) if live else fl
+    elif stats is not None:
+        stats.add_time('detect', clock() - t_loop)
@@ -2,620 +2,855 @@
 
 import sys
 import os
-import numpy as np
-import math as ma
-from datetime import timedelta
-from datetime import datetime
-from geopy import distance
-from itertools import islice
-import rasterio as rio
-import glob
-import csv
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-# Threshold values for MOP sensor
-thresholds = [300, 400, 500, 600, 700]
-
-# We use one global lock to protect CSV writing across threads
-csv_lock = threading.Lock()
-
-def c_time(file, csv_writers, dband1, demdata):
+import time
+import argparse
+
+# NumPy and everything built on it, the DEM and the worker pools are
+# imported by the subcommands that need them, so `scan` and `headers`
+# start quickly.  _STARTED is the start of the script for --timings.
+_STARTED = time.perf_counter()
+
+
+def sweep_label(sensor, on, off):
+    """Column label for a sweep pair; the MOP x/50 pairs keep their old names."""
+    if sensor == 'MOP' and off == 50:
+        return str(on)
+    return f"{sensor} {on}/{off}"
+
+
+def _grid(sweep_grid):
+    """`sweep_grid`, or the default flights.SWEEP when it is None."""
+    if sweep_grid is None:
+        from flights import SWEEP
+        return SWEEP
+    return sweep_grid
+
+
+def csv_header(sweep_grid=None, fields=False):
     """
-    Process one IGC file, detect flights, engine runs, etc.
-    Writes results to CSV using a shared `csv_writers` dict.
-    We only use the short name (basename) for the "File" column in the CSV.
+    Header of the Flt-times_{year}.csv files; with `fields` the nearest
+    takeoff and landing fields of --airfields follow.
+    """
+    sweep_grid = _grid(sweep_grid)
+    header = [
+        'Date (MM/DD/YYYY)', 'File', 'Gtype', 'Flight Time', 
+        'Start Time', 'End Time', 'Landing', 'Sensor Info'
+    ]
+    # Add extra columns for each swept threshold pair
+    for sensor, pairs in sweep_grid.items():
+        for on, off in pairs:
+            header.append(f"Sensor Info ({sweep_label(sensor, on, off)})")
+    if fields:
+        header += ['Takeoff Field', 'Takeoff Field Distance (m)',
+                   'Landing Field', 'Landing Field Distance (m)']
+    return header
+
+
+def _field_cells(field):
+    if field is None:
+        return ['', '']
+    return [field[0], str(int(round(field[1])))]
+
+
+def engine_info(flight):
     """
-    import os
+    The "Sensor Info" messages for one flight: engine runs of a minute or
+    more, then the ENL motor noise marks.
+    """
+    msgs = []
+    # Flights without a detected landing never had the glider type in front
+    prefix = f"{flight.gtype}'s " if flight.landed else ''
+    for run in flight.runs('engine'):
+        runtime = run.duration_s // 60
+        if runtime > 0:
+            msgs.append(f"{prefix}{run.sensor} monitor reports Engine Run {runtime} minutes, "
+                        f"starts at T={run.start} and: {int(run.msl_start_ft)} msl "
+                        f"[{int(run.agl_start_ft)} agl]; "
+                        f"Height gain/loss is: {run.height_gain_ft}")
+    enl = flight.runs('enl')
+    if enl:
+        times, agls = _marks(enl)
+        msgs.append(f"{flight.gtype} Motor noise registered by ENL sensor at t={times} "
+                    f"and {agls}AGL")
+    return msgs
+
+
+def _marks(runs):
+    """Transition times and AGLs [on, off, on, ...] of a list of runs."""
+    times = []
+    agls = []
+    for run in runs:
+        times.append(run.start)
+        agls.append(int(run.agl_start_ft))
+        if run.closed:
+            times.append(run.end)
+            agls.append(int(run.agl_end_ft))
+    return times, agls
+
+
+def sweep_infos(flight, sweep_grid):
+    """
+    One 'Sensor Info (...)' cell per swept threshold pair.
+    """
+    infos = []
+    for sensor, pairs in sweep_grid.items():
+        for on, off in pairs:
+            runs = flight.runs('sweep', sensor, on, off)
+            info = ''
+            if runs:
+                if sensor == 'MOP' and off == 50:
+                    label = f"threshold {on}"
+                else:
+                    label = f"threshold {on}/{off}"
+                smark, aglmark = _marks(runs)
+                info = (f"{flight.gtype} Motor noise registered by {sensor} sensor ({label}) "
+                        f"at t={smark} and {aglmark}AGL")
+            infos.append(info)
+    return infos
+
 
-    # Use short filename for CSV output:
-    igcfn = os.path.basename(file)  # e.g. "4536-9239003146.igc"
+def flight_row(flight, sweep_grid=None, fields=False):
+    """
+    The (flight_year, row) pair written to Flt-times_{year}.csv for a flight.
+    """
+    sweep_grid = _grid(sweep_grid)
+    row = [
+        flight.date,
+        flight.file,  # short file name
+        flight.gtype,
+        flight.flight_time,
+        flight.takeoff,
+        flight.landing,
+        flight.landing_class,
+        '\n'.join(engine_info(flight))
+    ] + sweep_infos(flight, sweep_grid)
+    if fields:
+        row += _field_cells(flight.takeoff_field) + _field_cells(flight.landing_field)
+    return flight.year, row
+
+
+def print_flight(flight, sweep_grid=None):
+    sweep_grid = _grid(sweep_grid)
+    if not flight.landed:
+        print('End of Trace, No stop time found, print anyway')
+    print('Glider: ' + flight.gtype + ' Date: ' + flight.date +
+          ' Flight Time: ' + flight.flight_time + ' Landing: ' + flight.landing_class +
+          ' Start Alt: ' + str(flight.start_alt_ft) + ' ft MSL')
+    print('Start Time: ' + flight.takeoff + ' Stop Time: ' + flight.landing +
+          ' Max Altitude: ' + str(flight.max_msl_ft) +
+          ' [' + str(flight.max_agl_ft) + '] ft MSL')
+    for msg in engine_info(flight):
+        print(msg)
+    for info in sweep_infos(flight, sweep_grid):
+        if info:
+            print(info)
+    print('\n\n')
+
+
+def read_file(file, dem, cache=None, stats=None):
+    """
+    The igc_parser.IGCFile of `file`, from the fix_cache.FixCache `cache`
+    when given, or None (reported) when it cannot be read.  A DEM that
+    cannot be opened raises dem_store.DEMError: no file would get far.
+    """
+    from dem_store import DEMError
+    from igc_parser import read_igc
 
+    t0 = time.perf_counter()
     try:
-        # Open file for reading
-        fn = open(file, encoding='utf-8', errors='ignore')
+        # Read and slice the whole file into columns
+        if cache is not None:
+            igc = cache.read(file, dem)
+        else:
+            igc = read_igc(file)
+    except DEMError:
+        raise
     except Exception as e:
         print(f"Could not open file {file}: {e}")
-        return
+        return None
+    if stats is not None:
+        stats.add_time('cache_read' if cache is not None else 'parse',
+                       time.perf_counter() - t0)
+    return igc
 
-    print(f"Processing file: {file}")  # Full path for debugging
 
-    # ---------------------------
-    # Original variable setup
-    # ---------------------------
-    atime = alat = alon = aN = aW = aF = apress = agnss = btime = blen = 0
-    spd = start = st = spress = bcnt = stop = hpress = mpress = dpress = 0
-    eng = rpm = enl = mop = engval = enlval = mopval = engflg = enlflg = 0
-    fdate = 'Unknown'
-    seng = []
-    agleng = []
-    msleng = []
-    senl = []
-    aglenl = []
-    mslenl = []
-    Iline = ''
-    FMT = '%H%M%S'
-    gid = 'Unknown'
-    gtype = 'Unknown'
-    cid = 'Unknown'
-    pname = 'P.Pilot'
-    HAT = onc = maxaglalt = aglalt = ilen = 0
-    shat = []
-    mhat = []
-    that = []
-    ahat = []
-    S2H = 3600
-    M2F = 3.28084
-    K2M = .621371
-    xtime = '00:03:30'
-    tas = gsp = sginit = demalt = dist = 0
-
-    # Initialize sensor_info variable for engine runs
-    sensor_info = ''
-
-    # Initialize threshold-based data structures
-    mop_data = {}
-    for t in thresholds:
-        mop_data[t] = {
-            'mopflg': 0,
-            'smop': [],
-            'mslmop': [],
-            'aglmop': [],
-            'sensor_info': ''
-        }
-
-    try:
-        # ---------------------------
-        # Main logic from original script
-        # ---------------------------
-        for line in fn:
-            line = line.strip().rstrip("\n").rstrip("\r")
-            igc = ''.join(islice(line, 1))
-            if igc == 'H':
-                hstr = line.split(":")
-                if hstr[0] == 'HFGTYGLIDERTYPE':
-                    gtype = ''.join((hstr[1]).split())
-                    continue
-                hdate = ''.join(islice(line, 5))
-                if hdate == 'HFDTE':
-                    res = str(line).split(":")
-                    if len(res) > 1:
-                        res2 = res[1].split(",")
-                        if len(res2) > 1:
-                            fltdate = res2[0]
-                        else:
-                            fltdate = res[1]
-                    else:
-                        fltdate = (''.join(islice(line, 5, 12)))
-                    fday = (''.join(islice(fltdate, 0, 2)))
-                    fmon = (''.join(islice(fltdate, 2, 4)))
-                    fyr = (''.join(islice(fltdate, 4, 6)))
-                    fdate = (str(fmon) + '/' + str(fday) + '/20' + str(fyr))
-                    if (str(fdate) == ''):
-                        fdate = 'Unknown'
-                    continue
-            if igc == 'I':
-                cnt = ''.join(islice(line, 1, 3))
-                if ((not cnt.isdigit()) or (int(cnt) == 0)):
-                    continue
-                Iline = line
-                j = 7
-                k = len(line)
-                sensor = ''
-                for i in range(int(cnt)):
-                    tag = ''.join(islice(line, j, j+3))
-                    if tag == 'TAS':
-                        tas = ''.join(islice(line, j-4, j-2))
-                    if tag == 'GSP':
-                        gsp = ''.join(islice(line, j-4, j-2))
-                    if tag == 'RPM':
-                        rpm = ''.join(islice(line, j-4, j-2))
-                    if tag == 'MOP':
-                        mop = ''.join(islice(line, j-4, j-2))
-                    if tag == 'ENL':
-                        enl = ''.join(islice(line, j-4, j-2))
-                    j = j+7
-
-                if int(enl or 0) > 0:
-                    eng = enl
-                    sensor = "ENL"
-                if int(mop or 0) > 0:
-                    eng = mop
-                    sensor = "MOP"
-                if int(rpm or 0) > 0:
-                    eng = rpm
-                    sensor = "RPM"
-                ilen = ''.join(islice(line, k-5, k-3))
-                continue
-            if igc == 'B':
-                if (blen == 0):
-                    blen = 1
-                    if (ilen == 0):
-                        ilen = len(line)
-                if (len(line) != int(ilen)):
-                    continue
-                bcnt = bcnt + 1
-                btime = atime
-                blat = alat
-                bN = aN
-                blon = alon
-                bW = aW
-                bpress = apress
-                bgnss = agnss
-                atime = ''.join(islice(line, 1, 7))
-            
-                asec = ''.join(islice(atime, 4, 6))
-                if (str(atime) == '000000'):
-                    atime = btime
-                    bcnt = bcnt - 1
-                    continue
-                aN = ''.join(islice(line, 14, 15))
-                aW = ''.join(islice(line, 23, 24))
-                if not (((aN == 'N') or (aN == 'S')) and ((aW == 'E') or (aW == 'W'))):
-                    atime = btime
-                    aN = bN
-                    aW = bW
-                    bcnt = bcnt - 1
-                    continue
-                alata = ''.join(islice(line, 7, 9))
-                if ((int(alata) == 0) or (int(alata) > 90)):
-                    atime = btime
-                    bcnt = bcnt - 1
-                    continue
-                alatb = ''.join(islice(line, 9, 14))
-                alatc = '{:0.5f}'.format(int(alatb) / 60000)
-                alatd = str(alatc).split('.')
-                alat = str(alata) + '.' + (str(alatd[1]))
-                alona = ''.join(islice(line, 15, 18))
-                alonb = ''.join(islice(line, 18, 23))
-                alonc = '{:0.5f}'.format(int(alonb) / 60000)
-                alond = str(alonc).split('.')
-                alon = str(alona) + '.' + (str(alond[1]))
-                aF = ''.join(islice(line, 24, 25))
-                if aW == 'W':
-                    alon = '-' + str(alon)
-                if aN == 'S':
-                    alat = '-' + str(alat)
-                apnt = (float(alat), float(alon))
-                bpnt = (float(blat), float(blon))
-                if (float(blat) > 0):
-                    dist = distance.distance(apnt, bpnt).m
-                else:
-                    dist = 0
-                apress = ''.join(islice(line, 25, 30))
-                agnss = ''.join(islice(line, 30, 35))
-                if ((aF == 'V') or (int(dist or 0) > 5000) or (int(asec) == 60) or 
-                    (int(apress) < -500) or (int(apress) == 0) or 
-                    ((abs(int(bpress or 0)-int(apress))) > 800 and bcnt > 1)):
-                    atime = btime
-                    alat = blat
-                    aN = bN
-                    aW = bW
-                    apress = bpress
-                    agnss = bgnss
-                    bcnt = bcnt - 1
-                    continue
-                if (bcnt == 1):
-                    try:
-                        dem = [demdata.index(float(alon), float(alat))]
-                        demx = dem[0][0]
-                        demy = dem[0][1]
-                        demalt = dband1[demx, demy]
-                    except IndexError:
-                        demalt = 0
-                    dpress = int(apress) - int(demalt)
-                    if (int(dpress) > 150):
-                        dpress = 0
-                    print('Calculating Surface height and Alt offset at start Pressure Alt: ' 
-                          + str(int(apress)) + '; Surface: ' + str(int(demalt)) 
-                          + ' Offset: ' + str(int(dpress)))
-                    spnt = (float(alat), float(alon))
-                apress = int(apress) - int(dpress)
-                if int(apress) > int(mpress):
-                    mpress = apress
-                if ((sginit == 0) and (int(apress) > 0)):
-                    if dpress == 0:
-                        spress = demalt
-                    else:
-                        spress = apress
-                    sginit = 1
-                paltd = int(apress) - int(bpress or 0)
-                if btime != 0:
-                    dtime = datetime.strptime(atime, FMT) - datetime.strptime(btime, FMT)
-                    dsec = dtime.total_seconds()
-                    if dsec == 0:
-                        continue
-                else:
-                    dsec = 1
-                pspd = spd
-                if int(eng or 0) >= 1:
-                    i = int(eng)-1
-                    engval = ''.join(islice(line, i, i+3))
-                if int(mop or 0) >= 1:
-                    i = int(mop)-1
-                    mopval = ''.join(islice(line, i, i+3))
-                if int(enl or 0) >= 1:
-                    i = int(enl)-1
-                    enlval = ''.join(islice(line, i, i+3))
-                if int(gsp or 0) >= 1:
-                    i = int(gsp)-1
-                    sp = ''.join(islice(line, i, i+3))
-                    spd = int(sp) * K2M
-                else:
-                    spd = (dist / dsec) * M2F / 5280 * S2H if dsec != 0 else 0
-                if (spd > (15*pspd)) and pspd != 0:
-                    continue
-                mslalt = M2F*float(apress)
-                try:
-                    dem = [demdata.index(float(alon), float(alat))]
-                    demx = dem[0][0]
-                    demy = dem[0][1]
-                    demalt = int(M2F*dband1[demx, demy])
-                except IndexError:
-                    demalt = 0  # default ground elevation
-                aglalt = mslalt - demalt
-                if aglalt > maxaglalt:
-                    maxaglalt = aglalt
-
-                # Threshold-based MOP logic
-                for t in thresholds:
-                    if ((start != 0) and (int(mopval or 0) > t) and (mop_data[t]['mopflg'] == 0)):
-                        mop_data[t]['mopflg'] = 1
-                        mop_data[t]['smop'].append(atime)
-                        mop_data[t]['mslmop'].append(mslalt)
-                        mop_data[t]['aglmop'].append(int(aglalt))
-                    if ((mop_data[t]['mopflg'] == 1) and (int(mopval or 0) < 50) and (int(mop or 0) > 0)):
-                        mop_data[t]['mopflg'] = 0
-                        mop_data[t]['smop'].append(atime)
-                        mop_data[t]['mslmop'].append(mslalt)
-                        mop_data[t]['aglmop'].append(int(aglalt))
-
-                # ENL/RPM/MOP sensor logic
-                if ((start != 0) and (int(engval or 0) > 0) and (engflg == 0)):
-                    if (((sensor == "MOP") and (int(engval) > 500)) or
-                        ((sensor == "ENL") and (int(engval) > 600)) or
-                        ((sensor == "RPM") and (int(engval) > 50))):
-                        engflg = 1
-                        if (int(btime or 0) == int(start or 0)):
-                            seng.append(start)
-                            msleng.append(M2F*float(bpress))
-                            agleng.append((M2F*float(bpress) - demalt))
-                        else:
-                            seng.append(atime)
-                            msleng.append(mslalt)
-                            agleng.append(aglalt)
-                if (engflg == 1):
-                    if (((sensor == "MOP") and (int(engval) < 50)) or 
-                        ((sensor == "ENL") and (int(engval) < 250)) or 
-                        ((sensor == "RPM") and (int(engval) < 20))):
-                        engflg = 0
-                        seng.append(atime)
-                        msleng.append(mslalt)
-                        agleng.append(aglalt)
-
-                # ENL fallback
-                if ((start != 0) and (int(enlval or 0) > 600) and (enlflg == 0) and (int(rpm or 0) == 0)):
-                    enlflg = 1
-                    senl.append(atime)
-                    mslenl.append(mslalt)
-                    aglenl.append(int(aglalt))
-                if ((enlflg == 1) and (int(enlval or 0) < 250) and (rpm == 0)):
-                    enlflg = 0
-                    senl.append(atime)
-                    mslenl.append(mslalt)
-                    aglenl.append(int(aglalt))
-
-                # Detect flight start
-                if spd >= 35:
-                    if start == 0:
-                        start = atime
-                        hpress = int(spress) + 180
-
-            if btime == 0:
-                continue
-
-            # Detect flight stop
-            if ((spd <= 15) and (aglalt <= 200) and (start != 0)):
-                st = st + 1
-                if st <= 5:
-                    continue
-                stop = atime
-                ldist = distance.distance(spnt, bpnt).m
-                if ldist > 1500:
-                    lo = "LOUT"
-                else:
-                    lo = "HOME"
-                fltime = datetime.strptime(stop, FMT) - datetime.strptime(start, FMT)
-                flc = ''.join(islice(str(fltime), 1))
-                if flc == '-':
-                    res = str(fltime).split(",")
-                    str(res[1]).split()
-                    ftime = res[1]
-                else:
-                    ftime = fltime
-                print('Glider: ' + str(gtype) + ' Date: ' + str(fdate) +
-                      ' Flight Time: ' + str(ftime) + ' Landing: ' + str(lo) +
-                      ' Start Alt: ' + str(int(M2F*int(spress))) + ' ft MSL')
-                print('Start Time: ' + str(start) + ' Stop Time: ' + str(stop) +
-                      ' Max Altitude: ' + str(int(M2F*int(mpress))) +
-                      '[' + str(int(maxaglalt)) + '] ft MSL')
-
-                # Engine run info
-                i = 0
-                while (i < len(seng)):
-                    s = seng[i]
-                    if (i+1 == len(seng)):
-                        ss = atime
-                        hgain = int(mslalt) - int(msleng[i])
-                    else:
-                        ss = seng[i+1]
-                        hgain = int(msleng[i+1]) - int(msleng[i])
-                    rntime = datetime.strptime(ss, FMT) - datetime.strptime(s, FMT)
-                    runtime = round(rntime.total_seconds()) / 60
-                    if (ma.floor(int(runtime)) > 0):
-                        msg = (f"{gtype}'s {sensor} monitor reports Engine Run {int(runtime)} minutes, "
-                               f"starts at T={s} and: {int(msleng[i])} msl [{int(agleng[i])} agl]; "
-                               f"Height gain/loss is: {int(hgain)}")
-                        print(msg)
-                        sensor_info += msg + '\n'
-                    i += 2
-
-                # ENL info
-                if (len(senl) > 0):
-                    msg = f"{gtype} Motor noise registered by ENL sensor at t={senl} and {aglenl}AGL"
-                    print(msg)
-                    sensor_info += msg + '\n'
-
-                # Threshold-based MOP info
-                threshold_sensor_infos = {}
-                for t in thresholds:
-                    if (len(mop_data[t]['smop']) > 0):
-                        msg = (f"{gtype} Motor noise registered by MOP sensor (threshold {t}) "
-                               f"at t={mop_data[t]['smop']} and {mop_data[t]['aglmop']}AGL")
-                        print(msg)
-                        mop_data[t]['sensor_info'] += msg + '\n'
-                    threshold_sensor_infos[t] = mop_data[t]['sensor_info'].strip()
-
-                print('\n\n')
-
-                # Extract the year from fdate
-                try:
-                    flight_year = fdate.split('/')[-1]
-                except IndexError:
-                    flight_year = 'Unknown'
-
-                # Thread-safe CSV write
-                with csv_lock:
-                    if flight_year not in csv_writers:
-                        output_file_path = f"Flt-times_{flight_year}.csv"
-                        csv_file = open(output_file_path, "w", newline='', encoding='utf-8')
-                        csv_writer = csv.writer(csv_file)
-                        # Add extra columns for each threshold
-                        header = [
-                            'Date (MM/DD/YYYY)', 'File', 'Gtype', 'Flight Time', 
-                            'Start Time', 'End Time', 'Landing', 'Sensor Info'
-                        ]
-                        for t in thresholds:
-                            header.append(f"Sensor Info ({t})")
-                        csv_writer.writerow(header)
-                        csv_writers[flight_year] = {'writer': csv_writer, 'file': csv_file}
-                    else:
-                        csv_writer = csv_writers[flight_year]['writer']
-
-                    row = [
-                        str(fdate),
-                        igcfn,  # <--- short file name
-                        str(gtype),
-                        str(ftime),
-                        str(start),
-                        str(stop),
-                        lo,
-                        sensor_info.strip()
-                    ] + [threshold_sensor_infos[t] for t in thresholds]
-
-                    csv_writer.writerow(row)
-
-                # Reset variables for next flight
-                HAT = onc = 0
-                shat = []
-                mhat = []
-                that = []
-                ahat = []
-                atime = alat = alon = aN = aW = aF = apress = agnss = btime = 0
-                spd = start = st = spress = bcnt = stop = hpress = mpress = sginit = 0
-                eng = rpm = enl = mop = rpmval = enlval = mopval = engflg = enlflg = 0
-                seng = []
-                msleng = []
-                agleng = []
-                senl = []
-                aglenl = []
-                mslenl = []
-                maxaglalt = aglalt = 0
-                sensor_info = ''
-                mop_data = {}
-                for t in thresholds:
-                    mop_data[t] = {
-                        'mopflg': 0,
-                        'smop': [],
-                        'mslmop': [],
-                        'aglmop': [],
-                        'sensor_info': ''
-                    }
-
-        # End-of-trace check
-        if ((stop == 0) and (start != 0)):
-            print('End of Trace, No stop time found, print anyway')
-            stop = atime
-            fltime = datetime.strptime(stop, FMT) - datetime.strptime(start, FMT)
-            ldist = distance.distance(spnt, bpnt).m
-            if ldist > 1500:
-                lo = "LOUT"
-            else:
-                lo = "HOME"
-            flc = ''.join(islice(str(fltime), 1))
-            if flc == '-':
-                res = str(fltime).split(",")
-                str(res[1]).split()
-                ftime = res[1]
-            else:
-                ftime = fltime
-            print('Glider: ' + str(gtype) + ' Date: ' + str(fdate) +
-                  ' Flight Time: ' + str(ftime) + ' Landing: ' + str(lo) +
-                  ' Start Alt: ' + str(int(M2F*int(spress))) + ' ft MSL')
-            print('Start Time: ' + str(start) + ' Stop Time: ' + str(stop) +
-                  ' Max Altitude: ' + str(int(M2F*int(mpress))) +
-                  ' [' + str(int(maxaglalt)) + '] ft MSL')
-
-            i = 0
-            while (i < len(seng)):
-                s = seng[i]
-                if (i+1 == len(seng)):
-                    ss = atime
-                    hgain = int(mslalt) - int(msleng[i])
-                else:
-                    ss = seng[i+1]
-                    hgain = int(msleng[i+1]) - int(msleng[i])
-                rntime = datetime.strptime(ss, FMT) - datetime.strptime(s, FMT)
-                runtime = round(rntime.total_seconds())/60
-                if (ma.floor(int(runtime)) > 0):
-                    msg = (f"{sensor} monitor reports Engine Run {int(runtime)} minutes, "
-                           f"starts at T={s} and: {int(msleng[i])} msl [{int(agleng[i])} agl]; "
-                           f"Height gain/loss is: {int(hgain)}")
-                    print(msg)
-                    sensor_info += msg + '\n'
-                i += 2
-
-            if (len(senl) > 0):
-                msg = f"{gtype} Motor noise registered by ENL sensor at t={senl} and {aglenl}AGL"
-                print(msg)
-                sensor_info += msg + '\n'
-
-            threshold_sensor_infos = {}
-            for t in thresholds:
-                if (len(mop_data[t]['smop']) > 0):
-                    msg = (f"{gtype} Motor noise registered by MOP sensor (threshold {t}) "
-                           f"at t={mop_data[t]['smop']} and {mop_data[t]['aglmop']}AGL")
-                    print(msg)
-                    mop_data[t]['sensor_info'] += msg + '\n'
-                threshold_sensor_infos[t] = mop_data[t]['sensor_info'].strip()
-
-            try:
-                flight_year = fdate.split('/')[-1]
-            except IndexError:
-                flight_year = 'Unknown'
-
-            # Thread-safe final CSV write
-            with csv_lock:
-                if flight_year not in csv_writers:
-                    output_file_path = f"Flt-times_{flight_year}.csv"
-                    csv_file = open(output_file_path, "w", newline='', encoding='utf-8')
-                    csv_writer = csv.writer(csv_file)
-                    header = [
-                        'Date (MM/DD/YYYY)', 'File', 'Gtype', 'Flight Time',
-                        'Start Time', 'End Time', 'Landing', 'Sensor Info'
-                    ]
-                    for t in thresholds:
-                        header.append(f"Sensor Info ({t})")
-                    csv_writer.writerow(header)
-                    csv_writers[flight_year] = {'writer': csv_writer, 'file': csv_file}
-                else:
-                    csv_writer = csv_writers[flight_year]['writer']
+def file_flights(file, dem, dist_method='local', sweep_grid=None, cache=None,
+                 stats=None, traces=None, filt=None, igc=None, fields=None):
+    """
+    Process one IGC file, detect flights, engine runs, etc.
+    Returns (flights, error): the flights.Flight records found, without
+    touching the CSV files, so it can run in a worker process, and None,
+    or the message of the error that cut the file short.  A file that
+    cannot be read gives no flights; an error part way through keeps the
+    flights before it.
+    `dist_method` is one of geodist.METHODS, `sweep_grid` maps sensors
+    to the (on, off) pairs reported in the "Sensor Info (...)" columns.
+    With a fix_cache.FixCache as `cache` the parsed fixes come from there.
+    `stats` is an optional profiling.FileStats for --profile.
+    With a traces.TraceExport as `traces` each flight's trace is written
+    here, in the worker, and not returned.  `filt` is an optional
+    sensor_sweep.SensorFilter for the engine sensors.  `igc` is the file
+    already read with read_file(), if it was.  `fields` is an optional
+    (airfields.Airfields, radius) pair to classify each flight with,
+    before its trace is written.  dem_store.DEMError is raised, not
+    swallowed like the errors of one file.
+    """
+    from archives import source_name
+    from dem_store import DEMError
+    from flights import iter_flights
 
-                row = [
-                    str(fdate),
-                    igcfn,  # short file name
-                    str(gtype),
-                    str(ftime),
-                    str(start),
-                    str(stop),
-                    lo,
-                    sensor_info.strip()
-                ] + [threshold_sensor_infos[t] for t in thresholds]
+    flights = []
+    if igc is None:
+        igc = read_file(file, dem, cache, stats)
+        if igc is None:
+            return flights, UNREADABLE
 
-                csv_writer.writerow(row)
+    print(f"Processing file: {file}")  # Full path for debugging
 
+    try:
+        for flight in iter_flights(igc, dem, dist_method, sweep_grid,
+                                   name=source_name(file), stats=stats, trace=traces,
+                                   filt=filt):
+            if fields is not None:
+                fields[0].classify(flight, fields[1])
+            if traces is not None:
+                t0 = time.perf_counter()
+                traces.write(file, flight)
+                flight.trace = None
+                if stats is not None:
+                    stats.add_time('traces', time.perf_counter() - t0)
+            flights.append(flight)
+    except DEMError:
+        raise
     except Exception as e:
         print(e)
         print('Exception occurred, go to next file')
-        return
-    finally:
-        fn.close()
+        return flights, str(e) or type(e).__name__
+    return flights, None
+
+
+# Error of file_flights() for a file that could not be read at all
+UNREADABLE = 'could not be read'
+
+# DEM and --airfields (fields, radius) handed to worker processes, set
+# before the pool starts (fork) or once per worker by _init_worker
+# (spawn), never pickled per task
+_worker_dem = None
+_worker_fields = None
+
+
+def _init_worker(dem_path, fields=None):
+    global _worker_dem, _worker_fields
+    if _worker_dem is None:
+        from dem_store import LazyDEM
+        _worker_dem = LazyDEM(dem_path)
+    if _worker_fields is None:
+        _worker_fields = fields
+
+
+def _process_file(file, dist_method, sweep_grid, cache, profile, traces, filt):
+    from profiling import FileStats
+
+    stats = FileStats(file) if profile else None
+    # The hash of the bytes read here goes back with the flights for the
+    # manifest, so the main thread never reads the file again
+    igc = read_file(file, _worker_dem, cache, stats)
+    if igc is None:
+        return [], stats, None, UNREADABLE
+    flights, error = file_flights(file, _worker_dem, dist_method, sweep_grid, cache, stats,
+                                  traces, filt, igc, _worker_fields)
+    return flights, stats, igc.sha1, error
+
+
+def merge_main(argv):
+    """`merge` subcommand: combine the outputs of --shard runs."""
+    from events import check_path
+    from shards import merge_csvs, merge_events
+
+    parser = argparse.ArgumentParser(
+        prog='glider-engine_edited.py merge',
+        description='Merge the Flt-times_{year}.shard*of*.csv files of --shard runs '
+                    'into Flt-times_{year}.csv, dropping duplicate flights.')
+    parser.add_argument('directory', nargs='?', default='.',
+                        help='directory holding the shard CSVs (default: .)')
+    parser.add_argument('--out-dir', metavar='DIR',
+                        help='where to write the merged CSVs (default: the same directory)')
+    parser.add_argument('--events', metavar='PATH',
+                        help='also merge the shard files of events file PATH into PATH')
+    parser.add_argument('--partial', action='store_true',
+                        help='merge even when the output of some shard is missing '
+                             '(default: stop with an error)')
+    args = parser.parse_args(argv)
+    if args.events:
+        try:
+            check_path(args.events)
+        except ValueError as e:
+            parser.error(str(e))
 
-
-def main():
-    if len(sys.argv) < 2:
+    try:
+        merged = merge_csvs(args.directory, args.out_dir, args.partial)
+    except ValueError as e:
+        sys.exit(f"Not merging: {e} (use --partial to merge anyway)")
+    if not merged:
+        print(f"No shard CSVs found in {args.directory}")
+    for path, (n, dups) in sorted(merged.items()):
+        print(f"Wrote {n} row(s) to {path}, dropped {dups} duplicate(s)")
+    if args.events:
+        try:
+            res = merge_events(args.events, args.directory, args.partial)
+        except ValueError as e:
+            sys.exit(f"Not merging events: {e} (use --partial to merge anyway)")
+        if res is None:
+            print(f"No shard files found for {args.events}")
+        else:
+            print(f"Wrote {res[0]} event(s) to {args.events}, dropped {res[1]} duplicate(s)")
+
+
+def follow_main(argv):
+    """`follow` subcommand: report events of a log while it is written."""
+    from archives import source_name
+    from dem_store import DEM
+    from flights import SWEEP
+    from geodist import METHODS
+    from live import follow, format_event, replay, tail_file, tail_stream
+    from sensor_sweep import parse_grid
+
+    parser = argparse.ArgumentParser(
+        prog='glider-engine_edited.py follow',
+        description='Follow an IGC log while it is written and print takeoff, '
+                    'engine on/off and landing events as soon as they are confirmed.')
+    parser.add_argument('source', help='IGC file to follow as it grows, or - for stdin')
+    parser.add_argument('--replay', type=float, metavar='SPEED',
+                        help='play a finished log back SPEED times faster than real '
+                             'time instead (0: as fast as possible)')
+    parser.add_argument('--poll', type=float, default=1.0, metavar='SECS',
+                        help='how often to check the file for new data (default: 1)')
+    parser.add_argument('--idle', type=float, metavar='SECS',
+                        help='stop when the file has not grown for SECS seconds '
+                             '(default: wait for the closing G record)')
+    parser.add_argument('--dem', default='conus.tif',
+                        help='DEM raster or converted .npy (default: conus.tif)')
+    parser.add_argument('--distance', choices=METHODS, default='local',
+                        help='fix-to-fix distance method, see geodist.py (default: local)')
+    parser.add_argument('--sweep', action='append', metavar='SENSOR:ON/OFF[,ON/OFF...]',
+                        help='threshold pairs reported with each landed flight, as in the '
+                             'main command')
+    args = parser.parse_args(argv)
+    try:
+        sweep_grid = parse_grid(args.sweep) if args.sweep else SWEEP
+    except ValueError as e:
+        parser.error(str(e))
+    if args.source == '-' and args.replay is not None:
+        parser.error('--replay needs a file')
+
+    dem = DEM.open(args.dem)
+    if args.source == '-':
+        name = 'stdin'
+        chunks = tail_stream(sys.stdin.buffer)
+    else:
+        name = source_name(args.source)
+        if args.replay is not None:
+            chunks = replay(args.source, args.replay)
+        else:
+            chunks = tail_file(args.source, args.poll, args.idle)
+    try:
+        for ev in follow(chunks, dem, args.distance, sweep_grid, name):
+            print(format_event(ev), flush=True)
+            if ev.flight is not None:
+                print_flight(ev.flight, sweep_grid)
+                sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+
+
+def scan_main(argv):
+    """`scan` subcommand: list the IGC files the process command would read."""
+    from discovery import iter_igc_files
+    from profiling import Timings
+
+    parser = argparse.ArgumentParser(
+        prog='glider-engine_edited.py scan',
+        description='List the IGC files found in directories and archives, one per '
+                    'line, without reading them.')
+    parser.add_argument('dirs', nargs='+', metavar='directory',
+                        help='directories or zip / tar.gz archives, as for process')
+    parser.add_argument('--no-recurse', action='store_true',
+                        help='only look at the files directly inside each directory')
+    parser.add_argument('--timings', action='store_true',
+                        help='print import and startup times to stderr')
+    args = parser.parse_args(argv)
+    timings = Timings(_STARTED)
+
+    def no_files(root):
+        print(f"No IGC files found in: {root}", file=sys.stderr)
+
+    errors = []
+
+    def unreadable(message):
+        print(message, file=sys.stderr)
+        errors.append(message)
+
+    n = 0
+    for path in iter_igc_files(args.dirs, recursive=not args.no_recurse, on_empty=no_files,
+                               on_error=unreadable):
+        if n == 0:
+            timings.mark('first file')
+        print(path)
+        n += 1
+    print(f"Found {n} IGC file(s).", file=sys.stderr)
+    if args.timings:
+        print(timings.report(), file=sys.stderr)
+    if errors:
+        sys.exit(f"{len(errors)} input(s) could not be read.")
+
+
+def headers_main(argv):
+    """`headers` subcommand: glider type, date and IDs of every file, from the H records."""
+    import csv
+    from discovery import iter_igc_files
+    from igc_header import read_header
+    from profiling import Timings
+
+    parser = argparse.ArgumentParser(
+        prog='glider-engine_edited.py headers',
+        description='Print the date, glider type, glider and competition ID and pilot '
+                    'of every IGC file as CSV, read from the H records only (no fixes, '
+                    'no DEM).')
+    parser.add_argument('dirs', nargs='+', metavar='directory',
+                        help='directories or zip / tar.gz archives, as for process')
+    parser.add_argument('--no-recurse', action='store_true',
+                        help='only look at the files directly inside each directory')
+    parser.add_argument('--summary', action='store_true',
+                        help='print the number of files per glider type and date instead')
+    parser.add_argument('--timings', action='store_true',
+                        help='print import and startup times to stderr')
+    args = parser.parse_args(argv)
+    timings = Timings(_STARTED)
+
+    def no_files(root):
+        print(f"No IGC files found in: {root}", file=sys.stderr)
+
+    errors = []
+
+    def unreadable(message):
+        print(message, file=sys.stderr)
+        errors.append(message)
+
+    out = csv.writer(sys.stdout, lineterminator='\n')
+    if args.summary:
+        out.writerow(['Gtype', 'Date (MM/DD/YYYY)', 'Files'])
+    else:
+        out.writerow(['Path', 'Date (MM/DD/YYYY)', 'Gtype', 'Glider ID',
+                      'Competition ID', 'Pilot'])
+    counts = {}
+    n = 0
+    for path in iter_igc_files(args.dirs, recursive=not args.no_recurse, on_empty=no_files,
+                               on_error=unreadable):
+        try:
+            h = read_header(path)
+        except Exception as e:
+            unreadable(f"Could not open file {path}: {e}")
+            continue
+        if n == 0:
+            timings.mark('first header')
+        n += 1
+        if args.summary:
+            counts[h.gtype, h.fdate] = counts.get((h.gtype, h.fdate), 0) + 1
+        else:
+            out.writerow([path, h.fdate, h.gtype, h.gid, h.cid, h.pilot])
+    for (gtype, fdate), count in sorted(counts.items()):
+        out.writerow([gtype, fdate, count])
+    sys.stdout.flush()
+    print(f"Read the headers of {n} IGC file(s).", file=sys.stderr)
+    if args.timings:
+        print(timings.report(), file=sys.stderr)
+    if errors:
+        sys.exit(f"{len(errors)} input(s) could not be read.")
+
+
+def process_main(argv):
+    """The `process` subcommand (also the default): detect flights and write the CSVs."""
+    global _worker_dem, _worker_fields
+    from profiling import Timings
+
+    timings = Timings(_STARTED)
+    with timings.timer('imports'):
+        import multiprocessing as mp
+        from itertools import chain, islice
+        from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor,
+                                        FIRST_COMPLETED, wait)
+        from discovery import iter_igc_files
+        from duplicates import Duplicates
+        from shards import clear_done, mark_done, parse_shard, shard_of, shard_path
+        from dem_store import DEM, DEMError, LazyDEM
+        from geodist import METHODS
+        from manifest import Manifest
+        from fix_cache import FixCache, dem_key
+        from profiling import Profile
+        from csv_writer import OrderedWriter, YearCSVs
+        from flight_db import FlightDB
+        from airfields import Airfields
+        from traces import TraceExport
+        from events import check_path, event_rows, write_events
+        from sensor_sweep import SensorFilter, parse_grid
+        from flights import SWEEP
+
+    parser = argparse.ArgumentParser(
+        prog='glider-engine_edited.py [process]',
+        description='Detect flights and engine runs in IGC logs.',
+        epilog='Other subcommands: "scan" lists the IGC files found, "headers" the '
+               'glider types and dates of their H records (both without loading the '
+               'DEM), "merge" combines the output of --shard runs and "follow" follows '
+               'a log while it is written; run "%(prog)s SUBCOMMAND -h" for their '
+               'options.')
+    parser.add_argument('dirs', nargs='*', metavar='directory',
+                        help='directories holding *.igc / *.IGC files (searched recursively), '
+                             'or zip / tar.gz archives of them, read without extracting')
+    parser.add_argument('--no-recurse', action='store_true',
+                        help='only look at the files directly inside each directory')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='files processed at a time (default: CPU count)')
+    parser.add_argument('--shard', metavar='I/N',
+                        help='only process the files of shard I of N (1-based, by a hash of '
+                             'the file name) and write Flt-times_{year}.shardIofN.csv; '
+                             'combine the shards with the merge subcommand')
+    parser.add_argument('--window', type=int, metavar='N',
+                        help='files handed to the pool ahead of the results '
+                             '(default: 4 per worker)')
+    parser.add_argument('--executor', choices=('thread', 'process'), default='thread',
+                        help='run files in threads or in worker processes (default: thread)')
+    parser.add_argument('--dem', default='conus.tif',
+                        help='DEM raster or converted .npy (default: conus.tif, '
+                             'uses conus.npy when dem_store.py has converted it)')
+    parser.add_argument('--distance', choices=METHODS, default='local',
+                        help='fix-to-fix distance method, see geodist.py (default: local)')
+    parser.add_argument('--sweep', action='append', metavar='SENSOR:ON/OFF[,ON/OFF...]',
+                        help='threshold pairs to report per sensor, one CSV column each, '
+                             'e.g. --sweep MOP:500/50,600/250 --sweep ENL:600/250 '
+                             '(default: MOP 300..700 on, 50 off)')
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help='process every file, even when its flight was already seen in '
+                             'another file (a copy, or the backup logger of the same glider)')
+    parser.add_argument('--sensor-median', type=float, default=0, metavar='SECS',
+                        help='smooth the engine sensor columns with a rolling median over '
+                             'SECS seconds before the on/off thresholds (default: off)')
+    parser.add_argument('--min-run', type=float, default=0, metavar='SECS',
+                        help='drop engine runs and sensor marks that last less than SECS '
+                             'seconds (default: off)')
+    parser.add_argument('--airfields', metavar='PATH',
+                        help='snap takeoffs and landings to the nearest field of a SeeYou '
+                             '.cup file or name/lat/lon CSV: Landing becomes HOME, AWAY '
+                             '(another airfield) or LOUT, and the field names and '
+                             'distances are added to the CSV')
+    parser.add_argument('--airfield-radius', type=float, default=3000.0, metavar='M',
+                        help='farthest a takeoff or landing snaps to a field (default: 3000)')
+    parser.add_argument('--cache', metavar='DIR',
+                        help='keep the parsed fixes and their DEM ground heights of every '
+                             'file in DIR and reuse them while the file and DEM are unchanged')
+    parser.add_argument('--manifest', metavar='PATH',
+                        help='only process files that are new or changed since the last run '
+                             'recorded in PATH, and rebuild the CSVs from all recorded results '
+                             '(with --shard, PATH.shardIofN per shard)')
+    parser.add_argument('--profile', metavar='PATH',
+                        help='time every stage and count rejected fixes per file and worker, '
+                             'write a JSON summary to PATH and print the slowest files')
+    parser.add_argument('--profile-top', type=int, default=10, metavar='N',
+                        help='slowest files to list with --profile (default: 10)')
+    parser.add_argument('--db', metavar='PATH',
+                        help='also keep every flight and engine run in the SQLite database '
+                             'PATH, indexed by glider type, date, sensor and landing class; '
+                             'files processed again replace their earlier entries')
+    parser.add_argument('--traces', metavar='DIR',
+                        help='also write the time, position, MSL/AGL altitude, speed and '
+                             'engine sensor trace of every flight to DIR, one .npz each, '
+                             'see traces.py')
+    parser.add_argument('--trace-tol', type=float, default=20.0, metavar='FT',
+                        help='drop trace fixes while the altitude stays within FT feet of '
+                             'a straight line (default: 20)')
+    parser.add_argument('--trace-window', type=int, default=120, metavar='SECS',
+                        help='keep every fix within SECS seconds of an engine run start or '
+                             'end (default: 120)')
+    parser.add_argument('--events', metavar='PATH',
+                        help='also write one typed row per detected engine run / sensor '
+                             'event to PATH (.parquet, needs pyarrow, or .csv)')
+    parser.add_argument('--timings', action='store_true',
+                        help='print how long the imports, DEM load and first result took')
+    args = parser.parse_args(argv)
+    if not args.dirs:
         print("Usage: flt-times.py [directory]/")
         sys.exit(0)
+    if args.events:
+        try:
+            check_path(args.events)
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        sweep_grid = parse_grid(args.sweep) if args.sweep else SWEEP
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+    csv_pattern = 'Flt-times_{year}.csv'
+    events_path = args.events
+    manifest_path = args.manifest
+    if shard is not None:
+        # Every shard keeps its own outputs and manifest, so shards run
+        # side by side never write the same file
+        csv_pattern = shard_path(csv_pattern, *shard)
+        if events_path:
+            events_path = shard_path(events_path, *shard)
+        if manifest_path:
+            manifest_path = shard_path(manifest_path, *shard)
+
+    # The DEM is loaded once (memory-mapped if converted with dem_store.py),
+    # when the first file not in the fix cache needs it
+    dem = LazyDEM(args.dem)
+    cache = FixCache(args.cache, dem_key(args.dem)) if args.cache else None
+    filt = None
+    if args.sensor_median > 0 or args.min_run > 0:
+        filt = SensorFilter(args.sensor_median, args.min_run)
+    airfields = None
+    if args.airfields:
+        try:
+            airfields = Airfields.load(args.airfields)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        print(f"Loaded {len(airfields)} field(s) from {args.airfields}")
+    db = FlightDB(args.db) if args.db else None
+    traces = None
+    if args.traces:
+        traces = TraceExport(args.traces, args.trace_tol, args.trace_window)
+
+    # Found lazily, in a stable order, as the pool takes them
+    def no_files(root):
+        print(f"No IGC files found in: {root}")
+
+    # Inputs that could not be read at all; they make the exit status 1
+    unreadable = []
+
+    def cannot_read(message):
+        print(message)
+        unreadable.append(message)
+
+    files = iter_igc_files(args.dirs, recursive=not args.no_recurse, on_empty=no_files,
+                           on_error=cannot_read)
+    if shard is not None:
+        i, n = shard
+        print(f"Processing shard {i} of {n}")
+        clear_done(i, n)
+        files = (f for f in files if shard_of(f, n) == i)
+
+    # Skip files holding a flight already seen in an earlier file, before
+    # anything parses them; a manifest or database forgets them too
+    dups = None
+    if not args.keep_duplicates:
+        dups = Duplicates()
+
+        def unique(files):
+            for f in files:
+                original = dups.check(f)
+                if original is None:
+                    yield f
+                    continue
+                print(f"Skipping {f}: same flight as {original}")
+                if manifest is not None:
+                    manifest.files.pop(f, None)
+                if db is not None:
+                    db.delete_file(f)
+
+        files = unique(files)
+
+    # Skip files already processed with the same settings
+    manifest = None
+    todo = files
+    if manifest_path:
+        settings = {'dem': os.path.abspath(args.dem), 'distance': args.distance,
+                    'sweep': sweep_grid}
+        if filt is not None:
+            settings['sensor_filter'] = [args.sensor_median, args.min_run]
+        if airfields is not None:
+            settings['airfields'] = [os.path.abspath(args.airfields), args.airfield_radius]
+        manifest = Manifest.load(manifest_path, settings)
+        gone = manifest.prune()
+        if gone:
+            print(f"Dropped {gone} file(s) no longer on disk from {manifest_path}.")
+        todo = (f for f in files if manifest.changed(f))
+
+    # Find the first file to process before loading anything for it: with
+    # nothing to do the DEM is never opened
+    todo = iter(todo)
+    first = next(todo, None)
+    if first is not None:
+        timings.mark('first file')
+        todo = chain([first], todo)
+        # A DEM that cannot be opened stops the run here, not file by file
+        try:
+            with timings.timer('dem check'):
+                DEM.check(args.dem)
+        except DEMError as e:
+            sys.exit(str(e))
+        print("Adding DEM heights for each lat/long")
+
+    # Process them in parallel with a thread or process pool, keeping at
+    # most `window` files submitted at a time
+    max_workers = max(1, args.workers)
+    window = max(max_workers, args.window or 4*max_workers)
+    print(f"Processing up to {max_workers} file(s) at a time...")
 
-    # Dictionary to hold csv writers for each year
-    csv_writers = {}
-
-    # Load the DEM data once
-    print("Adding DEM heights for each lat/long")
-    demdata = rio.open('conus.tif')
-    dband1 = demdata.read(1)
-
-    # Gather all .IGC / .igc files from the directories
-    all_igc_files = []
-    for directory in sys.argv[1:]:
-        igc_files = glob.glob(os.path.join(directory, "*.IGC")) \
-                  + glob.glob(os.path.join(directory, "*.igc"))
-        if not igc_files:
-            print(f"No IGC files found in directory: {directory}")
+    # Workers only return Flight records; rows go to the single CSV writer
+    # thread in input order, events are kept per input file
+    out = OrderedWriter(YearCSVs(csv_header(sweep_grid, airfields is not None),
+                                 csv_pattern))
+    file_events = {}
+    profile = Profile() if args.profile else None
+    _worker_dem = dem
+    _worker_fields = (airfields, args.airfield_radius) if airfields is not None else None
+    if args.executor == 'process':
+        # With fork the workers share the parent's DEM pages copy-on-write
+        if 'fork' in mp.get_all_start_methods():
+            ctx = mp.get_context('fork')
+            if first is not None:
+                try:
+                    dem.load()
+                except DEMError as e:
+                    sys.exit(str(e))
         else:
-            # Convert each found file to an absolute path
-            for f in igc_files:
-                all_igc_files.append(os.path.abspath(f))
-
-    # Deduplicate paths (avoid processing same file multiple times)
-    unique_files = list(set(all_igc_files))
-    print(f"Found {len(unique_files)} unique IGC file(s).")
-
-    if not unique_files:
+            ctx = mp.get_context()
+        executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx,
+                                       initializer=_init_worker,
+                                       initargs=(args.dem, _worker_fields))
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    n_found = n_done = 0
+    dem_error = None
+    with executor:
+        todo = enumerate(todo)
+        in_flight = {}
+
+        def submit(n):
+            for seq, f in islice(todo, n):
+                in_flight[executor.submit(_process_file, f, args.distance, sweep_grid,
+                                          cache, profile is not None, traces,
+                                          filt)] = (seq, f)
+
+        submit(window)
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                seq, file_ = in_flight.pop(future)
+                n_found = max(n_found, seq + 1)
+                n_done += 1
+                timings.mark('first result')
+                try:
+                    flights, stats, sha1, error = future.result()
+                except DEMError as exc:
+                    dem_error = exc
+                    break
+                except Exception as exc:
+                    cannot_read(f"Error processing file {file_}: {exc}")
+                    if manifest is None:
+                        out.put(seq, [])
+                    continue
+                if error == UNREADABLE:
+                    unreadable.append(file_)
+                for flight in flights:
+                    print_flight(flight, sweep_grid)
+                if db is not None:
+                    db.upsert_file(file_, flights)
+                rows = [flight_row(f, sweep_grid, airfields is not None) for f in flights]
+                events = [ev for f in flights for ev in event_rows(f)]
+                if manifest is not None:
+                    # A file that failed keeps what it gave but is retried next run
+                    manifest.record(file_, rows, events, 'error' if error else None, sha1)
+                    manifest.checkpoint()
+                else:
+                    t0 = time.perf_counter()
+                    out.put(seq, rows)
+                    if stats is not None:
+                        stats.add_time('queue_wait', time.perf_counter() - t0)
+                    if events:
+                        file_events[seq] = events
+                if profile is not None:
+                    profile.add(stats)
+            if dem_error is not None:
+                for future in in_flight:
+                    future.cancel()
+                break
+            submit(len(done))
+
+    if dem_error is not None:
+        # Nothing after this could get ground heights; keep what was done
+        out.close()
+        if db is not None:
+            db.close()
+        if manifest is not None:
+            manifest.save()
+        sys.exit(f"Stopped: {dem_error}")
+
+    if db is not None:
+        db.close()
+        print(f"Updated {args.db}")
+    if dups is not None and dups.found:
+        print(f"Skipped {len(dups.found)} duplicate file(s).")
+    if manifest is not None:
+        print(f"Processed {n_done} new or changed IGC file(s), "
+              f"{len(manifest.files)} in {manifest_path}.")
+    else:
+        print(f"Processed {n_found} IGC file(s).")
+    if n_found == 0 and (manifest is None or not manifest.files):
+        out.close()
         print("No IGC files found in any provided directories.")
+        if args.timings:
+            print(timings.report())
+        if unreadable:
+            sys.exit(f"{len(unreadable)} input(s) could not be read, see above.")
+        if shard is not None:
+            # Nothing of this shard's files to write, but it is finished
+            mark_done(*shard)
         return
 
-    # Process them in parallel with a thread pool
-    max_workers = min(len(unique_files), os.cpu_count() or 1)
-    print(f"Processing up to {max_workers} file(s) at a time...")
+    # Rebuild the per-year CSVs from every file in the manifest
+    if manifest is not None:
+        manifest.save()
+        out.put(0, manifest.rows())
+        all_events = list(manifest.events())
+    else:
+        all_events = [ev for seq in sorted(file_events) for ev in file_events[seq]]
+    out.close()
+
+    if events_path:
+        write_events(events_path, all_events)
+        print(f"Wrote {len(all_events)} event(s) to {events_path}")
+
+    if profile is not None:
+        profile.extra['csv_writer'] = {'rows': out.rows, 'flushes': out.flushes,
+                                       'seconds': out.seconds}
+        if dups is not None:
+            profile.extra['duplicates'] = {'files': len(dups.found),
+                                           'seconds': dups.seconds}
+        profile.write(args.profile, args.profile_top)
+        print(profile.report(args.profile_top))
+        print(f"Wrote profile to {args.profile}")
+
+    if args.timings:
+        if dem.loaded:
+            timings.add('dem', dem.seconds)
+        print(timings.report())
+    if unreadable:
+        sys.exit(f"Done, but {len(unreadable)} input(s) could not be read, see above.")
+    if shard is not None:
+        # Only a run that got through every file counts for merge
+        mark_done(*shard)
+    print("All done.")
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_file = {
-            executor.submit(c_time, f, csv_writers, dband1, demdata): f
-            for f in unique_files
-        }
-        for future in as_completed(future_to_file):
-            file_ = future_to_file[future]
-            try:
-                future.result()
-            except Exception as exc:
-                print(f"Error processing file {file_}: {exc}")
-
-    # Close all open CSV files
-    for year, writer_info in csv_writers.items():
-        writer_info['file'].close()
 
-    print("All done.")
+def main():
+    commands = {'process': process_main, 'scan': scan_main, 'headers': headers_main,
+                'merge': merge_main, 'follow': follow_main}
+    if len(sys.argv) > 1 and sys.argv[1] in commands:
+        return commands[sys.argv[1]](sys.argv[2:])
+    # No subcommand: process, as before there were any
+    return process_main(sys.argv[1:])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+"""
+IGC header (H record) values, without parsing the fixes.
+
+The H records come before the first B record, so the glider type, date
+and IDs of a log are known from its first few kilobytes.  read_header()
+reads only that much and needs neither NumPy nor the DEM, for listing
+large collections quickly (the `headers` subcommand):
+
+    h = read_header('4536-9239003146.igc')
+    h.gtype, h.fdate              # same format as igc_parser.IGCFile
+
+header_line() is the H record decoder igc_parser uses for whole files.
+"""
+
+from archives import read_source, split_member
+
+# Bytes read at a time while looking for the end of the header
+_BLOCK = 1 << 14
+
+
+class Header(object):
+    """
+    Header values of one IGC file, formatted as in igc_parser.IGCFile
+    ('Unknown' when missing, dates as MM/DD/20YY).
+    """
+
+    __slots__ = ('gtype', 'fdate', 'gid', 'cid', 'pilot')
+
+    def __init__(self):
+        self.gtype = 'Unknown'
+        self.fdate = 'Unknown'
+        self.gid = 'Unknown'
+        self.cid = 'Unknown'
+        self.pilot = 'P.Pilot'
+
+
+def header_line(igc, line):
+    """Set the header value of the H record `line` on `igc` (Header or IGCFile)."""
+    hstr = line.split(":")
+    if hstr[0] == 'HFGTYGLIDERTYPE' and len(hstr) > 1:
+        igc.gtype = ''.join(hstr[1].split()) or 'Unknown'
+    elif line[:5] == 'HFGID' and len(hstr) > 1:
+        igc.gid = ''.join(hstr[1].split()) or 'Unknown'
+    elif line[:5] == 'HFCID' and len(hstr) > 1:
+        igc.cid = ''.join(hstr[1].split()) or 'Unknown'
+    elif line[:5] == 'HFPLT' and len(hstr) > 1:
+        igc.pilot = hstr[1].strip() or 'P.Pilot'
+    elif line[:5] == 'HFDTE':
+        if len(hstr) > 1:
+            fltdate = hstr[1].split(",")[0]
+        else:
+            fltdate = line[5:12]
+        fltdate = fltdate.strip()
+        if len(fltdate) >= 6 and fltdate[:6].isdigit():
+            igc.fdate = fltdate[2:4] + '/' + fltdate[0:2] + '/20' + fltdate[4:6]
+
+
+def _head(path):
+    """The bytes of `path` up to its first B record (or the whole file)."""
+    if split_member(path)[1] is not None:
+        data = read_source(path)
+        end = data.find(b'\nB')
+        return data if end < 0 else data[:end]
+    head = bytearray()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(_BLOCK)
+            if not block:
+                return bytes(head)
+            start = max(len(head) - 1, 0)
+            head += block
+            if head[:1] == b'B':
+                return b''
+            end = head.find(b'\nB', start)
+            if end >= 0:
+                return bytes(head[:end])
+
+
+def read_header(path):
+    """Header of the IGC file (or archive member) `path`."""
+    igc = Header()
+    for line in _head(path).decode('utf-8', errors='ignore').splitlines():
+        line = line.strip()
+        if line[:1] == 'H':
+            header_line(igc, line)
+    return igc
@@ -0,0 +1,291 @@
+"""
+Columnar IGC reader.
+
+Reads a whole IGC file in one go and turns its B records into NumPy
+columns with fixed-width slicing on the raw byte buffer, instead of
+slicing every record character by character.
+
+    igc = read_igc('4536-9239003146.igc')
+    igc.gtype, igc.fdate          # header values, same format as c_time
+    igc.fixes['lat']              # float64 degrees, south negative
+    igc.fixes['ENL']              # one int column per I-record extension
+"""
+
+import hashlib
+import numpy as np
+
+from archives import read_source
+from igc_header import header_line
+from timeaxis import unwrap
+
+# Fixed part of a B record (0-based byte offsets, end exclusive)
+B_TIME = (1, 7)
+B_LAT_DEG = (7, 9)
+B_LAT_MIN = (9, 14)
+B_NS = 14
+B_LON_DEG = (15, 18)
+B_LON_MIN = (18, 23)
+B_EW = 23
+B_FIX = 24
+B_PRESS = (25, 30)
+B_GNSS = (30, 35)
+B_LEN = 35
+
+_NL = ord('\n')
+_CR = ord('\r')
+_SP = ord(' ')
+_MINUS = ord('-')
+
+
+class IGCFile(object):
+    """
+    Parsed IGC file.
+
+    Header values use the same formatting as the original c_time loop
+    ('Unknown' when missing, dates as MM/DD/20YY).  `extensions` maps each
+    I-record tag (ENL, MOP, RPM, GSP, TAS, ...) to its 0-based (start, end)
+    byte range in the B record.  `fixes` holds one NumPy array per column:
+
+        hhmmss  int32   time as the integer HHMMSS (182314)
+        time    int32   seconds of the UTC day
+        secs    int32   seconds since 00:00 UTC of the first fix's day,
+                        counting on past 86400 after midnight (timeaxis.py)
+        lat     float64 degrees, south negative
+        lon     float64 degrees, west negative
+        valid   bool    fix validity flag is 'A'
+        press   int32   pressure altitude (m)
+        gnss    int32   GNSS altitude (m)
+        <TAG>   int32   one column per I-record extension
+
+    Only B records of the expected length whose fixed fields decode are
+    kept; `nbad` counts the ones that were dropped.  `last_secs` is the
+    secs of the last fix parsed with a non-zero time, None before the
+    first.  `sha1` is the
+    hex SHA-1 of the file's bytes when read_igc() read it whole.
+    """
+
+    __slots__ = ('gtype', 'fdate', 'gid', 'cid', 'pilot', 'extensions',
+                 'blen', 'fixes', 'nbad', 'last_secs', 'sha1')
+
+    def __init__(self):
+        self.gtype = 'Unknown'
+        self.fdate = 'Unknown'
+        self.gid = 'Unknown'
+        self.cid = 'Unknown'
+        self.pilot = 'P.Pilot'
+        self.extensions = {}
+        self.blen = 0
+        self.fixes = {}
+        self.nbad = 0
+        self.last_secs = None
+        self.sha1 = None
+
+    def __len__(self):
+        return len(self.fixes.get('time', ()))
+
+
+def read_igc(source):
+    """
+    Parse an IGC file given a path, an open binary file object or the raw bytes.
+    A path may also name a member of a zip/tar archive, see archives.py.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+    elif hasattr(source, 'read'):
+        data = source.read()
+    else:
+        data = read_source(source)
+    igc = parse_igc(data)
+    igc.sha1 = hashlib.sha1(data).hexdigest()
+    return igc
+
+
+def parse_igc(data):
+    """
+    Parse the raw bytes of an IGC file into an IGCFile.
+    """
+    igc = IGCFile()
+    igc.fixes = _parse_lines(igc, data)
+    return igc
+
+
+class IGCStream(object):
+    """
+    Resumable parser for an IGC file that is still being written.
+
+    feed() takes the bytes that arrived since the last call, in chunks of
+    any size, and returns the fixes of the B records completed by them
+    (same columns as IGCFile.fixes); a partial last line is kept for the
+    next call.  Header and I records update `igc` as they arrive, `nbad`
+    included; igc.fixes itself stays empty.
+
+        stream = IGCStream()
+        for chunk in chunks:
+            fixes = stream.feed(chunk)
+        fixes = stream.close()
+    """
+
+    def __init__(self):
+        self.igc = IGCFile()
+        self.igc.fixes = _empty_fixes(self.igc.extensions)
+        self._rest = b''
+
+    def feed(self, data):
+        data = self._rest + data
+        cut = data.rfind(b'\n') + 1
+        self._rest = data[cut:]
+        return _parse_lines(self.igc, data[:cut])
+
+    def close(self):
+        """Fixes of a last line that had no line end."""
+        data, self._rest = self._rest, b''
+        return _parse_lines(self.igc, data)
+
+
+def _parse_lines(igc, data):
+    """
+    Parse complete lines of an IGC file: H and I records update `igc`,
+    and the fixes of the B records are returned.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if buf.size == 0:
+        return _empty_fixes(igc.extensions)
+
+    # Line boundaries, with trailing CR/blanks trimmed like str.strip()
+    nl = np.flatnonzero(buf == _NL)
+    starts = np.concatenate(([0], nl + 1))
+    ends = np.concatenate((nl, [buf.size]))
+    keep = ends > starts
+    starts = starts[keep]
+    ends = ends[keep]
+    while True:
+        last = buf[np.maximum(ends - 1, 0)]
+        trim = (ends > starts) & ((last == _CR) | (last == _SP))
+        if not trim.any():
+            break
+        ends = ends - trim
+    lens = ends - starts
+    first = buf[starts]
+
+    # Header and I records are few, decode them as text
+    for s, e in zip(starts[(first == ord('H')) | (first == ord('I'))],
+                    ends[(first == ord('H')) | (first == ord('I'))]):
+        line = data[s:e].decode('utf-8', errors='ignore').strip()
+        if line[:1] == 'H':
+            header_line(igc, line)
+        elif not igc.extensions:
+            _iline(igc, line)
+
+    isb = first == ord('B')
+    if not isb.any():
+        return _empty_fixes(igc.extensions)
+
+    # Expected B record length: end of the last extension, else the first B record
+    if igc.blen == 0:
+        igc.blen = int(lens[np.argmax(isb)])
+    bstarts = starts[isb & (lens == igc.blen)]
+    igc.nbad += int(isb.sum()) - len(bstarts)
+    if igc.blen < B_LEN or len(bstarts) == 0:
+        igc.nbad += len(bstarts)
+        return _empty_fixes(igc.extensions)
+
+    # One row per B record, one column per byte
+    rec = buf[bstarts[:, None] + np.arange(igc.blen)]
+
+    hh, ok = _digits(rec, (1, 3))
+    mm, ok2 = _digits(rec, (3, 5))
+    ss, ok3 = _digits(rec, (5, 7))
+    ok &= ok2 & ok3
+    latd, ok2 = _digits(rec, B_LAT_DEG)
+    latm, ok3 = _digits(rec, B_LAT_MIN)
+    ok &= ok2 & ok3
+    lond, ok2 = _digits(rec, B_LON_DEG)
+    lonm, ok3 = _digits(rec, B_LON_MIN)
+    ok &= ok2 & ok3
+    press, ok2 = _digits(rec, B_PRESS, signed=True)
+    gnss, ok3 = _digits(rec, B_GNSS, signed=True)
+    ok &= ok2 & ok3
+    ns = rec[:, B_NS]
+    ew = rec[:, B_EW]
+    ok &= (ns == ord('N')) | (ns == ord('S'))
+    ok &= (ew == ord('E')) | (ew == ord('W'))
+
+    igc.nbad += int((~ok).sum())
+    lat = latd + latm / 60000.0
+    lat[ns == ord('S')] *= -1
+    lon = lond + lonm / 60000.0
+    lon[ew == ord('W')] *= -1
+
+    tod = (hh * 3600 + mm * 60 + ss)[ok]
+    secs = unwrap(tod, igc.last_secs)
+    if (tod != 0).any():
+        igc.last_secs = int(secs[tod != 0][-1])
+    fixes = {
+        'hhmmss': (hh * 10000 + mm * 100 + ss)[ok].astype(np.int32),
+        'time': tod.astype(np.int32),
+        'secs': secs.astype(np.int32),
+        'lat': lat[ok],
+        'lon': lon[ok],
+        'valid': (rec[:, B_FIX] == ord('A'))[ok],
+        'press': press[ok].astype(np.int32),
+        'gnss': gnss[ok].astype(np.int32),
+    }
+    for tag, (a, b) in igc.extensions.items():
+        if b > igc.blen or b <= a:
+            fixes[tag] = np.zeros(int(ok.sum()), dtype=np.int32)
+            continue
+        val, vok = _digits(rec, (a, b))
+        fixes[tag] = np.where(vok, val, 0)[ok].astype(np.int32)
+    return fixes
+
+
+def _digits(rec, span, signed=False):
+    """
+    Decode a fixed-width decimal field for every row of `rec`.
+    Returns the int64 values and a mask of rows where the field was all digits.
+    """
+    a, b = span
+    d = rec[:, a:b].astype(np.int64) - ord('0')
+    neg = None
+    if signed:
+        neg = rec[:, a] == _MINUS
+        d[neg, 0] = 0
+    ok = ((d >= 0) & (d <= 9)).all(axis=1)
+    val = d @ (10 ** np.arange(b - a - 1, -1, -1, dtype=np.int64))
+    if signed:
+        val[neg] *= -1
+    return val, ok
+
+
+def _iline(igc, line):
+    # I + NN extensions, each SS EE TAG with 1-based inclusive byte positions
+    cnt = line[1:3]
+    if not cnt.isdigit() or int(cnt) == 0:
+        return
+    ext = {}
+    j = 3
+    for i in range(int(cnt)):
+        field = line[j:j+7]
+        if len(field) < 7 or not field[:4].isdigit():
+            break
+        ext[field[4:7]] = (int(field[0:2]) - 1, int(field[2:4]))
+        j += 7
+    if ext:
+        igc.extensions = ext
+        igc.blen = int(line[j-5:j-3])
+
+
+def _empty_fixes(extensions):
+    fixes = {
+        'hhmmss': np.zeros(0, dtype=np.int32),
+        'time': np.zeros(0, dtype=np.int32),
+        'secs': np.zeros(0, dtype=np.int32),
+        'lat': np.zeros(0),
+        'lon': np.zeros(0),
+        'valid': np.zeros(0, dtype=bool),
+        'press': np.zeros(0, dtype=np.int32),
+        'gnss': np.zeros(0, dtype=np.int32),
+    }
+    for tag in extensions:
+        fixes[tag] = np.zeros(0, dtype=np.int32)
+    return fixes
@@ -0,0 +1,123 @@
+"""
+Following IGC logs while they are written.
+
+A ground station streaming a contest day appends B records to a log as
+the glider flies.  follow() reads such a log chunk by chunk with a
+resumable parser (igc_parser.IGCStream) and the resumable detection of
+flights.iter_events(), and yields takeoff, engine on/off and landing
+events as soon as they are confirmed instead of after the landing:
+
+    for ev in follow(tail_file('live/N123.igc'), dem, name='N123.igc'):
+        print(format_event(ev))
+
+replay() plays a finished log back as if it were being written, sped up,
+to try this out on old logs:
+
+    python glider-engine_edited.py follow 4536-9239003146.igc --replay 60
+    ground-station-feed | python glider-engine_edited.py follow -
+"""
+
+import time
+
+from archives import read_source
+from flights import iter_events
+from igc_parser import IGCStream
+
+
+def tail_file(path, poll=1.0, idle=None):
+    """
+    Yield what is appended to the file `path` as it grows.
+
+    Stops once the G (security) record that closes an IGC file has been
+    read and nothing follows it, or after `idle` seconds without new data
+    (None: keep waiting).  The file is checked every `poll` seconds.
+    """
+    last = time.monotonic()
+    closed = False
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read()
+            if data:
+                last = time.monotonic()
+                closed = data.rstrip().rsplit(b'\n', 1)[-1][:1] == b'G'
+                yield data
+                continue
+            if closed or (idle is not None and time.monotonic() - last >= idle):
+                return
+            time.sleep(poll)
+
+
+def tail_stream(f, size=1 << 16):
+    """Yield what arrives on the binary stream `f` (e.g. stdin) until EOF."""
+    read = getattr(f, 'read1', f.read)
+    while True:
+        data = read(size)
+        if not data:
+            return
+        yield data
+
+
+def replay(path, speed=60.0, chunk=4096):
+    """
+    Yield the bytes of a finished log as if it were being written.
+
+    Every B record is held back until its fix time, `speed` times faster
+    than real time.  With speed 0 the file comes at once in `chunk`-byte
+    pieces, cut anywhere, not only at line ends.
+    """
+    data = read_source(path)
+    if speed <= 0:
+        for i in range(0, len(data), chunk):
+            yield data[i:i+chunk]
+        return
+    out = []
+    t_first = prev = None
+    offset = 0
+    started = time.monotonic()
+    for line in data.splitlines(keepends=True):
+        # B000000 is a logger glitch, not a time to wait for (timeaxis.unwrap)
+        if line[:1] == b'B' and line[1:7].isdigit() and line[1:7] != b'000000':
+            t = int(line[1:3])*3600 + int(line[3:5])*60 + int(line[5:7]) + offset
+            if prev is not None and t < prev - 43200:
+                # Past midnight UTC
+                offset += 86400
+                t += 86400
+            prev = t
+            if t_first is None:
+                t_first = t
+            wait = started + (t - t_first) / speed - time.monotonic()
+            if wait > 0:
+                if out:
+                    yield b''.join(out)
+                    out = []
+                time.sleep(wait)
+        out.append(line)
+    if out:
+        yield b''.join(out)
+
+
+def follow(chunks, dem, dist_method='local', sweep_grid=None, name=''):
+    """
+    FlightEvents (see flights.iter_events) of the IGC bytes yielded by
+    `chunks`, e.g. tail_file(), tail_stream() or replay().
+    """
+    stream = IGCStream()
+
+    def fixes():
+        for data in chunks:
+            yield stream.feed(data)
+        yield stream.close()
+
+    return iter_events(stream.igc, fixes(), dem, dist_method, sweep_grid, name)
+
+
+def format_event(ev):
+    """One line describing a FlightEvent."""
+    hms = f"{ev.time[0:2]}:{ev.time[2:4]}:{ev.time[4:6]}"
+    line = f"{hms} {ev.kind:<10} {ev.file} flight {ev.index + 1}"
+    if ev.sensor:
+        line += f" {ev.sensor}"
+    line += f" MSL {int(ev.msl_ft)} ft AGL {int(ev.agl_ft)} ft"
+    if ev.flight is not None:
+        line += f" {ev.flight.landing_class} {ev.flight.flight_time.strip()}"
+    return line
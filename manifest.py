@@ -0,0 +1,162 @@
+"""
+Processed-file manifest for incremental runs.
+
+Keeps one entry per IGC file, keyed by absolute path (or archive member
+reference, see archives.py), with the file's size, mtime and SHA-1 and
+the result of processing it: the CSV rows it produced, or "no_flight"
+when none were found, and their engine-run events.  A rerun over a
+growing archive then only parses new or changed files and rewrites the
+per-year CSVs from the stored rows.  A file whose processing failed
+("error") keeps the rows found before the error and counts as changed
+on the next run, so it is retried.  Archive members are compared by
+their own size and mtime from the archive index (see
+archives.stat_source), so adding logs to an archive does not make the
+members already in it look changed.  Entries are also tied to the
+settings that produced them (distance method, sweep grid, ...); when
+those change everything is redone.
+"""
+
+import os
+import json
+import time
+import hashlib
+
+from archives import read_source, split_member, stat_source
+
+VERSION = 3
+
+
+def file_sha1(path, bufsize=1 << 20):
+    if split_member(path)[1] is not None:
+        return hashlib.sha1(read_source(path)).hexdigest()
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(bufsize)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Manifest(object):
+    """
+    JSON manifest of processed files.
+
+        m = Manifest.load('Flt-times_manifest.json', settings)
+        todo = [f for f in files if m.changed(f)]
+        ...
+        m.record(f, rows)
+        m.checkpoint()                  # now and then during the run
+        m.save()
+    """
+
+    def __init__(self, path, settings=None):
+        self.path = path
+        # Round-trip through JSON so tuples compare equal to what was saved
+        self.settings = json.loads(json.dumps(settings or {}))
+        self.files = {}
+        self._saved_at = time.monotonic()
+        self._save_s = 0.0
+
+    @classmethod
+    def load(cls, path, settings=None):
+        m = cls(path, settings)
+        if not os.path.exists(path):
+            return m
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != VERSION:
+            print(f"Manifest {path} has an old format, reprocessing all files.")
+            return m
+        if data.get('settings', {}) != m.settings:
+            print(f"Settings changed since {path} was written, reprocessing all files.")
+            return m
+        m.files = data.get('files', {})
+        return m
+
+    def changed(self, path):
+        """
+        True if `path` is not in the manifest, failed last time or its
+        content changed.  Size and mtime decide when they match; otherwise
+        the hash does.
+        """
+        entry = self.files.get(path)
+        if entry is None or entry.get('status') == 'error':
+            return True
+        try:
+            st = stat_source(path)
+        except (OSError, KeyError):
+            return True  # gone from its archive; processing reports it
+        if st.st_size != entry['size']:
+            return True
+        if st.st_mtime == entry['mtime']:
+            return False
+        if file_sha1(path) != entry['sha1']:
+            return True
+        entry['mtime'] = st.st_mtime  # touched but unchanged
+        return False
+
+    def record(self, path, rows, events=(), status=None, sha1=None):
+        """
+        Store the rows (and event tuples) produced for `path`, with its
+        current size/mtime and hash.  Pass the `sha1` of the bytes the
+        worker parsed (igc_parser.IGCFile.sha1) to spare reading the file
+        again here; archive members read out of order are slow to seek
+        to.  `status` 'error' marks a file that failed part way, to be
+        processed again next run.  A file that can no longer be read is
+        dropped.
+        """
+        try:
+            st = stat_source(path)
+            sha1 = sha1 or file_sha1(path)
+        except (OSError, KeyError):
+            self.files.pop(path, None)
+            return
+        self.files[path] = {
+            'size': st.st_size,
+            'mtime': st.st_mtime,
+            'sha1': sha1,
+            'status': status or ('ok' if rows else 'no_flight'),
+            'rows': [[year, row] for year, row in rows],
+            'events': [list(ev) for ev in events],
+        }
+
+    def prune(self):
+        """Drop entries whose file no longer exists.  Returns how many."""
+        gone = [p for p in self.files if not os.path.exists(split_member(p)[0])]
+        for p in gone:
+            del self.files[p]
+        return len(gone)
+
+    def rows(self):
+        """All stored (flight_year, row) pairs, in path order."""
+        for path in sorted(self.files):
+            for year, row in self.files[path]['rows']:
+                yield year, row
+
+    def events(self):
+        """All stored event tuples, in path order."""
+        for path in sorted(self.files):
+            for ev in self.files[path].get('events', []):
+                yield tuple(ev)
+
+    def checkpoint(self, interval=60.0):
+        """
+        save() when `interval` seconds have passed since the last save and
+        at least 20 times as long as that save took.  Every save rewrites
+        the whole manifest, so on a large archive saving stays a small
+        share of the run instead of growing with every file.
+        """
+        if time.monotonic() - self._saved_at >= max(interval, 20 * self._save_s):
+            self.save()
+
+    def save(self):
+        t0 = time.monotonic()
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': VERSION, 'settings': self.settings,
+                       'files': self.files}, f)
+        os.replace(tmp, self.path)
+        self._saved_at = time.monotonic()
+        self._save_s = self._saved_at - t0
@@ -0,0 +1,159 @@
+"""
+Per-file stage timers and counters for --profile.
+
+Each file processed gets a FileStats, filled in by the worker that reads
+it (parse, DEM lookup, distances, detection, sensor sweeps, and why fixes
+were rejected) and by the main thread when it queues the rows for the
+CSV writer thread (queue_wait).  Profile gathers them and writes a JSON
+summary:
+
+    stats = FileStats(path)
+    flights = list(iter_flights(path, dem, stats=stats))
+    profile = Profile()
+    profile.add(stats)
+    profile.write('profile.json')
+    print(profile.report(top=10))
+
+Timings does the same for the startup of a run (--timings): imports,
+DEM load and time to the first result.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+class FileStats(object):
+    """
+    Seconds per stage and event counters for one file.
+
+    `worker` names the process and thread that processed the file.
+    Counters used by iter_flights: fixes, bad_records (B records the
+    parser dropped), dem_outside, fixes_used, flights, and reject_<rule>
+    for every fix filter rule that threw a fix away.
+    """
+
+    __slots__ = ('file', 'worker', 'times', 'counts')
+
+    def __init__(self, file, worker=None):
+        self.file = file
+        self.worker = worker or f"{os.getpid()}:{threading.current_thread().name}"
+        self.times = {}
+        self.counts = {}
+
+    def add_time(self, stage, seconds):
+        self.times[stage] = self.times.get(stage, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    @contextmanager
+    def timer(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - t0)
+
+    @property
+    def total(self):
+        return sum(self.times.values())
+
+    def as_dict(self):
+        return {'file': self.file, 'worker': self.worker, 'seconds': self.total,
+                'times': self.times, 'counts': self.counts}
+
+
+class Profile(object):
+    """All FileStats of a run, summed per stage, counter and worker."""
+
+    def __init__(self):
+        self.files = []
+        self.extra = {}
+        self.started = time.perf_counter()
+
+    def add(self, stats):
+        self.files.append(stats)
+
+    def summary(self, top=10):
+        times = {}
+        counts = {}
+        workers = {}
+        for st in self.files:
+            for k, v in st.times.items():
+                times[k] = times.get(k, 0.0) + v
+            for k, v in st.counts.items():
+                counts[k] = counts.get(k, 0) + v
+            w = workers.setdefault(st.worker, {'files': 0, 'seconds': 0.0})
+            w['files'] += 1
+            w['seconds'] += st.total
+        slowest = sorted(self.files, key=lambda st: st.total, reverse=True)[:top]
+        return {
+            'wall_seconds': time.perf_counter() - self.started,
+            'files': len(self.files),
+            'times': times,
+            'counts': counts,
+            'workers': workers,
+            'slowest': [st.as_dict() for st in slowest],
+            'extra': self.extra,
+            'per_file': [st.as_dict() for st in self.files],
+        }
+
+    def write(self, path, top=10):
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(top), f, indent=1)
+        os.replace(tmp, path)
+
+    def report(self, top=10):
+        s = self.summary(top)
+        lines = [f"Profile: {s['files']} file(s), {s['wall_seconds']:.2f}s wall"]
+        busy = sum(s['times'].values()) or 1.0
+        for stage, sec in sorted(s['times'].items(), key=lambda kv: -kv[1]):
+            lines.append(f"  {stage:<12} {sec:10.3f}s {100*sec/busy:5.1f}%")
+        for name, n in sorted(s['counts'].items()):
+            lines.append(f"  {name:<24} {n}")
+        lines.append(f"Slowest {len(s['slowest'])} file(s):")
+        for st in s['slowest']:
+            stages = ', '.join(f"{k} {v:.3f}" for k, v in
+                               sorted(st['times'].items(), key=lambda kv: -kv[1])[:3])
+            lines.append(f"  {st['seconds']:8.3f}s  {st['file']}  ({stages})")
+        return '\n'.join(lines)
+
+
+class Timings(object):
+    """
+    Startup and run stages of one command, for --timings: how long the
+    imports, the DEM load and the wait for the first result took, in the
+    order they happened.  `started` is a time.perf_counter() reading taken
+    when the script began.
+    """
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.stages = []
+
+    def add(self, stage, seconds):
+        self.stages.append((stage, seconds))
+
+    @contextmanager
+    def timer(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - t0)
+
+    def mark(self, stage):
+        """Record the time from the start of the script to now as `stage`, once."""
+        if all(name != stage for name, _ in self.stages):
+            self.add(stage, time.perf_counter() - self.started)
+
+    def report(self):
+        lines = ['Timings:']
+        for stage, sec in self.stages:
+            lines.append(f"  {stage:<16} {sec:8.3f}s")
+        lines.append(f"  {'total':<16} {time.perf_counter() - self.started:8.3f}s")
+        return '\n'.join(lines)
@@ -0,0 +1,193 @@
+"""
+Multi-threshold hysteresis sweep over engine sensor columns.
+
+The engine-on logic of the original c_time loop is a hysteresis: a sensor switches on at the
+first fix above an `on` threshold (once the flight has started) and off
+again at the first fix below an `off` threshold, e.g. MOP 500/50, ENL
+600/250 or RPM 50/20.  sweep() evaluates any number of such (on, off)
+pairs over a whole sensor column at once, instead of one Python loop step
+per fix and per threshold:
+
+    trans = sweep(fixes['MOP'], [(300, 50), (500, 50), (700, 50)], armed)
+    trans[1]      # fix indices [on, off, on, off, ...] for MOP 500/50
+
+Single noisy fixes flip such a hysteresis on and off, leaving bursts of
+one-second "engine runs" on a landing rollout.  SensorFilter smooths the
+columns with a rolling median before the sweep and drops runs shorter
+than a minimum duration after it, both with windows in seconds.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Default grid, the pairs the original c_time loop used
+ENGINE_PAIRS = {'MOP': (500, 50), 'ENL': (600, 250), 'RPM': (50, 20)}
+ENL_PAIR = (600, 250)
+
+
+def sweep(values, pairs, armed=None):
+    """
+    Switch-on/switch-off transitions for every (on, off) pair in one pass.
+
+    A pair turns on at a fix where value > on and `armed` is true, and off
+    at a fix where value < off.  Pairs must have on >= off.  Returns one
+    int array per pair holding the fix indices of its transitions in order
+    [on, off, on, off, ...]; an odd length means it was still on at the end.
+
+    The fixes below an `off` threshold cut the column into segments.  In
+    each segment a pair switches on at the first armed fix above `on` and
+    off where the segment ends, so with a running maximum per segment every
+    `on` threshold is a binary search.  The column is scanned once per
+    distinct `off` value; more `on` thresholds only add their output.
+    """
+    v = np.asarray(values)
+    pairs = np.asarray(pairs, dtype=np.float64).reshape(-1, 2)
+    if len(pairs) == 0:
+        return []
+    if (pairs[:, 0] < pairs[:, 1]).any():
+        raise ValueError("Threshold pairs need on >= off")
+    out = [None] * len(pairs)
+    for off in np.unique(pairs[:, 1]):
+        which = np.flatnonzero(pairs[:, 1] == off)
+        for j, trans in zip(which, _sweep_off(v, pairs[which, 0], off, armed)):
+            out[j] = trans
+    return out
+
+
+def _sweep_off(v, ons, off, armed):
+    n = v.size
+    if n == 0:
+        return [np.zeros(0, dtype=np.intp) for _ in ons]
+    down = v < off
+    downpos = np.flatnonzero(down)
+    seg = np.cumsum(down)
+
+    # Values that can switch a pair on, ranked; fixes that cannot rank 0
+    cand = ~down
+    if armed is not None:
+        cand &= np.asarray(armed, dtype=bool)
+    uniq, rank = np.unique(v[cand], return_inverse=True)
+    ranks = np.zeros(n, dtype=np.int64)
+    ranks[cand] = rank.reshape(-1) + 1
+
+    # Running max rank restarting at every segment, kept globally sorted
+    width = len(uniq) + 1
+    key = seg * width + ranks
+    np.maximum.accumulate(key, out=key)
+    ends = np.append(downpos, n) - 1         # last fix of each segment
+    ends = ends[ends >= 0]
+    segs = seg[ends]
+    segmax = key[ends] - segs * width
+    order = np.argsort(segmax, kind='stable')
+    sorted_max = segmax[order]
+
+    out = []
+    for on in ons:
+        # value > on  <=>  rank >= q
+        q = np.searchsorted(uniq, on, side='right') + 1
+        hit = np.sort(segs[order[np.searchsorted(sorted_max, q):]])
+        starts = np.searchsorted(key, hit * width + q)
+        stops = np.searchsorted(downpos, starts)   # next fix below `off`
+        trans = np.empty(2 * len(hit), dtype=np.intp)
+        trans[0::2] = starts
+        if len(hit) and stops[-1] == len(downpos):
+            trans = trans[:-1]
+            trans[1::2] = downpos[stops[:-1]]
+        else:
+            trans[1::2] = downpos[stops]
+        out.append(trans)
+    return out
+
+
+def rolling_median(values, secs, window_s):
+    """
+    Centred rolling median of `values` over about `window_s` seconds.
+
+    The window is a fixed number of fixes (odd, at least 3) worked out
+    from the median fix interval of `secs`, so a whole column is one
+    vectorized median over a sliding window view; the ends are padded
+    with the first and last value.
+    """
+    v = np.asarray(values)
+    secs = np.asarray(secs)
+    if window_s <= 0 or v.size < 3:
+        return v
+    dt = float(np.median(np.diff(secs))) if secs.size > 1 else 1.0
+    w = int(round(window_s / dt)) if dt > 0 else int(window_s)
+    w |= 1
+    if w < 3:
+        return v
+    w = min(w, v.size if v.size % 2 else v.size - 1)
+    padded = np.pad(v, w // 2, mode='edge')
+    return np.median(sliding_window_view(padded, w), axis=1).astype(v.dtype)
+
+
+def drop_short(trans, secs, min_s):
+    """
+    Transitions (see sweep) without the on/off runs lasting less than
+    `min_s` seconds of `secs`.  A run still on at the end is kept.
+    """
+    trans = np.asarray(trans)
+    if min_s <= 0 or trans.size < 2:
+        return trans
+    secs = np.asarray(secs)
+    on = trans[0::2]
+    off = trans[1::2]
+    keep = np.ones(on.size, dtype=bool)
+    keep[:off.size] = secs[off] - secs[on[:off.size]] >= min_s
+    return trans[np.repeat(keep, 2)[:trans.size]]
+
+
+class SensorFilter(object):
+    """
+    Noise filtering around the hysteresis: a rolling median over
+    `median_s` seconds on each sensor column before it, runs shorter than
+    `min_s` seconds dropped after it.  0 turns either off.
+    """
+
+    def __init__(self, median_s=0, min_s=0):
+        self.median_s = median_s
+        self.min_s = min_s
+
+    def column(self, values, secs):
+        return rolling_median(values, secs, self.median_s)
+
+    def runs(self, trans, secs):
+        return drop_short(trans, secs, self.min_s)
+
+
+def sweep_sensors(fixes, grid, armed=None):
+    """
+    Run sweep() for every sensor in `grid` ({'MOP': [(on, off), ...], ...})
+    that has a column in `fixes`.  Returns {(sensor, on, off): transitions}.
+    """
+    out = {}
+    for sensor, pairs in grid.items():
+        if sensor not in fixes or not pairs:
+            continue
+        for (on, off), trans in zip(pairs, sweep(fixes[sensor], pairs, armed)):
+            out[(sensor, on, off)] = trans
+    return out
+
+
+def parse_grid(specs):
+    """
+    Parse command line sweep specs such as 'MOP:300/50,500/50' or
+    'ENL:600/250' into {'MOP': [(300, 50), (500, 50)], 'ENL': [(600, 250)]}.
+    """
+    grid = {}
+    for spec in specs:
+        sensor, _, pairs = spec.partition(':')
+        sensor = sensor.strip().upper()
+        if not sensor or not pairs:
+            raise ValueError(f"Bad sweep spec {spec!r}, expected SENSOR:ON/OFF[,ON/OFF...]")
+        for pair in pairs.split(','):
+            on, _, off = pair.partition('/')
+            try:
+                on, off = int(on), int(off)
+            except ValueError:
+                raise ValueError(f"Bad threshold pair {pair!r} in {spec!r}")
+            if on < off:
+                raise ValueError(f"Threshold pair {pair!r} needs on >= off")
+            grid.setdefault(sensor, []).append((on, off))
+    return grid
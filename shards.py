@@ -0,0 +1,226 @@
+"""
+Sharded runs and merging their output.
+
+`--shard i/N` makes a run process only the IGC files whose short name
+hashes to shard i of N (1-based), so N machines, or N local processes,
+split an archive without talking to each other and get the same split
+on every rerun.  Each run writes Flt-times_{year}.shard{i}of{N}.csv (and
+events.shard{i}of{N}.parquet / .csv, and a --manifest of its own), and
+Flt-times.shard{i}of{N}.done once it has finished, even when it found
+no flight; merge_csvs() checks that every shard is done and combines
+the CSVs into the usual Flt-times_{year}.csv files:
+
+    for i in 1 2 3 4; do python glider-engine_edited.py logs/ --shard $i/4 & done; wait
+    python glider-engine_edited.py merge .
+"""
+
+import os
+import re
+import csv
+import glob
+import hashlib
+from datetime import date
+
+from archives import source_name
+from events import COLUMNS, NAMES, write_events
+
+# Columns that identify a flight row; rows agreeing on all of them are duplicates
+ROW_KEY = ('Date (MM/DD/YYYY)', 'File', 'Gtype', 'Start Time', 'End Time')
+
+# Written by a shard run once its outputs are complete, see mark_done()
+DONE_NAME = 'Flt-times.done'
+
+# Columns that identify an event
+EVENT_KEY = ('file', 'flight', 'kind', 'sensor', 'on', 'off', 'start_time')
+
+_SHARD_RE = re.compile(r'^(.*)\.shard(\d+)of(\d+)(\.[^.]+)$')
+
+
+def parse_shard(spec):
+    """'2/4' -> (2, 4); raises ValueError unless 1 <= i <= N."""
+    i, sep, n = spec.partition('/')
+    try:
+        i, n = int(i), int(n)
+    except ValueError:
+        raise ValueError(f"Bad shard {spec!r}, expected i/N such as 1/4")
+    if not sep or n < 1 or not 1 <= i <= n:
+        raise ValueError(f"Bad shard {spec!r}, expected i/N with 1 <= i <= N")
+    return i, n
+
+
+def shard_of(path, n):
+    """1-based shard of a file: a hash of its lower-cased short name."""
+    h = hashlib.sha1(source_name(path).lower().encode('utf-8')).hexdigest()
+    return int(h[:8], 16) % n + 1
+
+
+def shard_path(path, i, n):
+    """'Flt-times_{year}.csv' -> 'Flt-times_{year}.shard2of4.csv'."""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.shard{i}of{n}{ext}"
+
+
+def mark_done(i, n, directory='.'):
+    """Record that shard i of n has finished (Flt-times.shard{i}of{n}.done)."""
+    path = os.path.join(directory, shard_path(DONE_NAME, i, n))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"shard {i} of {n} done\n")
+    return path
+
+
+def clear_done(i, n, directory='.'):
+    """Remove the marker of shard i of n, when a run of it starts again."""
+    try:
+        os.remove(os.path.join(directory, shard_path(DONE_NAME, i, n)))
+    except FileNotFoundError:
+        pass
+
+
+def _shard_groups(pattern):
+    """{merged path: [shard paths]} for the shard files matching `pattern`."""
+    groups = {}
+    for path in sorted(glob.glob(pattern)):
+        m = _SHARD_RE.match(path)
+        if m:
+            groups.setdefault(m.group(1) + m.group(4), []).append(path)
+    return groups
+
+
+def _check_complete(target, directory, partial=False):
+    """
+    Raise ValueError unless the completion markers in `directory` come
+    from one shard count N and hold every shard 1..N; with `partial`
+    only warn.
+    """
+    stem, ext = os.path.splitext(DONE_NAME)
+    paths = glob.glob(os.path.join(glob.escape(directory), f"{stem}.shard*of*{ext}"))
+    counts = set()
+    found = set()
+    for path in paths:
+        m = _SHARD_RE.match(path)
+        if m:
+            found.add(int(m.group(2)))
+            counts.add(int(m.group(3)))
+    problem = None
+    if not counts:
+        problem = f"{target}: no shard has finished (no {stem}.shard*of*{ext} in {directory})"
+    elif len(counts) > 1:
+        problem = f"{target} mixes shard counts {sorted(counts)}"
+    else:
+        n = counts.pop()
+        missing = [f"{i}of{n}" for i in range(1, n + 1) if i not in found]
+        if missing:
+            problem = f"{target}: shard {', '.join(missing)} has not finished"
+    if problem is None:
+        return
+    if not partial:
+        raise ValueError(problem)
+    print(f"Warning: {problem}")
+
+
+def merge_csvs(directory='.', out_dir=None, partial=False):
+    """
+    Merge every Flt-times_{year}.shard*of*.csv in `directory` into
+    Flt-times_{year}.csv in `out_dir` (default: the same directory).
+
+    Raises ValueError, before writing anything, unless every shard 1..N
+    left its completion marker in `directory` (see mark_done(); a shard
+    that found no flight writes no CSV); with `partial` it only warns and
+    merges what is there.
+
+    The merged header is the fixed columns followed by every
+    "Sensor Info (...)" column of the shards in first-seen order, so
+    shards run with different --sweep grids still line up (missing cells
+    are left empty).  Duplicate flights are dropped, and rows are sorted
+    by file, date and start time so the result does not depend on which
+    shard found what.  Returns {merged path: (rows written, duplicates)}.
+    """
+    out_dir = directory if out_dir is None else out_dir
+    result = {}
+    groups = _shard_groups(os.path.join(directory, 'Flt-times_*.shard*of*.csv'))
+    if groups:
+        _check_complete(os.path.join(directory, 'Flt-times_*.csv'), directory, partial)
+    for target, paths in groups.items():
+        header = []
+        rows = []
+        for path in paths:
+            with open(path, newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                cols = next(reader, None)
+                if cols is None:
+                    continue
+                for col in cols:
+                    if col not in header:
+                        header.append(col)
+                for row in reader:
+                    rows.append(dict(zip(cols, row)))
+        seen = set()
+        merged = []
+        for row in rows:
+            key = tuple(row.get(c, '') for c in ROW_KEY)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append([row.get(c, '') for c in header])
+        order = [header.index(c) for c in ('File', 'Date (MM/DD/YYYY)', 'Start Time')]
+        merged.sort(key=lambda r: [r[i] for i in order])
+        out = os.path.join(out_dir, os.path.basename(target))
+        with open(out, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(merged)
+        result[out] = (len(merged), len(rows) - len(merged))
+    return result
+
+
+def _cell(t, value):
+    # Dates stay YYYY-MM-DD strings in event tuples, see events.py
+    if t is date:
+        return value or None
+    return t(value)
+
+
+def read_events(path):
+    """Event tuples (events.COLUMNS order) from a .parquet or .csv events file."""
+    if path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        cols = [table.column(name).to_pylist() for name in NAMES]
+        i = NAMES.index('date')
+        cols[i] = [v.isoformat() if v is not None else None for v in cols[i]]
+        return list(zip(*cols))
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return [tuple(_cell(t, v) for (_, t), v in zip(COLUMNS, row)) for row in reader]
+
+
+def merge_events(path, directory='.', partial=False):
+    """
+    Merge the shard files of events file `path` (e.g. events.shard*of*.parquet
+    for events.parquet) into `path`, dropping duplicates.  Returns
+    (events written, duplicates), or None when there are no shard files.
+    Raises ValueError when a shard has left no completion marker in
+    `directory`, unless `partial`.
+    """
+    stem, ext = os.path.splitext(path)
+    paths = _shard_groups(f"{glob.escape(stem)}.shard*of*{ext}").get(path)
+    if not paths:
+        return None
+    _check_complete(path, directory, partial)
+    seen = set()
+    merged = []
+    n = 0
+    key = [NAMES.index(c) for c in EVENT_KEY]
+    for shard in paths:
+        for ev in read_events(shard):
+            n += 1
+            k = tuple(ev[i] for i in key)
+            if k in seen:
+                continue
+            seen.add(k)
+            merged.append(ev)
+    merged.sort(key=lambda ev: tuple(ev[i] for i in key))
+    write_events(path, merged)
+    return len(merged), n - len(merged)
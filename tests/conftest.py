@@ -0,0 +1,72 @@
+import os
+import sys
+import math
+
+import numpy as np
+import pytest
+
+# The modules are flat at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dem_store import DEM  # noqa: E402
+
+
+def _lat(lat):
+    h = 'N' if lat >= 0 else 'S'
+    lat = abs(lat)
+    d = int(lat)
+    return '%02d%05d%s' % (d, round((lat - d) * 60000), h)
+
+
+def _lon(lon):
+    h = 'E' if lon >= 0 else 'W'
+    lon = abs(lon)
+    d = int(lon)
+    return '%03d%05d%s' % (d, round((lon - d) * 60000), h)
+
+
+def b_record(tod, lat, lon, alt):
+    """One B record (no extensions) at `tod` seconds of the UTC day."""
+    tod %= 86400
+    return 'B%02d%02d%02d%s%sA%05d%05d' % (tod // 3600, tod // 60 % 60, tod % 60,
+                                          _lat(lat), _lon(lon), int(alt), int(alt) + 10)
+
+
+@pytest.fixture
+def flight_lines():
+    """
+    make(start, minutes, gtype='JS-3-18m', gid=None, lat=40.0, lon=-105.0,
+    heading=0.0, extra=None) -> IGC text of one flight: 200 s on the
+    ground at 1600 m, `minutes` of flight at 30 m/s, 300 s on the ground.
+    `extra` maps an index into the B records to a line inserted before it.
+    """
+    def make(start, minutes, gtype='JS-3-18m', gid=None, lat=40.0, lon=-105.0,
+             heading=0.0, extra=None):
+        lines = ['AXXXABC', 'HFDTEDATE:280824,01', f'HFGTYGLIDERTYPE:{gtype}']
+        if gid is not None:
+            lines.append(f'HFGIDGLIDERID:{gid}')
+        fly = minutes * 60
+        alt = 1600.0
+        fixes = []
+        for k in range(200 + fly + 300):
+            el = k - 200
+            spd = 30 if 0 <= el < fly else 0
+            if 0 <= el < 300:
+                alt += 3
+            elif fly - 300 <= el < fly:
+                alt = max(1600.0, alt - 4)
+            elif el >= fly:
+                alt = 1600.0
+            lat += spd * math.cos(heading) / 111000
+            lon += spd * math.sin(heading) / (111000 * math.cos(math.radians(lat)))
+            fixes.append(b_record(start + k, lat, lon, alt))
+        for i in sorted(extra or {}, reverse=True):
+            fixes.insert(i, extra[i])
+        return '\r\n'.join(lines + fixes + ['GABCDEF']) + '\r\n'
+    return make
+
+
+@pytest.fixture
+def flat_dem():
+    """A 1550 m flat DEM over 39..41 N, 106..104 W."""
+    return DEM(np.full((200, 200), 1550, dtype=np.int16), (0.01, 0, -106.0, 0, -0.01, 41.0))
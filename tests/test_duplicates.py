@@ -0,0 +1,19 @@
+from duplicates import Duplicates, fingerprint, same_flight
+
+
+def test_same_trace_other_glider_type_is_not_a_duplicate(tmp_path, flight_lines):
+    a = tmp_path / 'a.igc'
+    b = tmp_path / 'b.igc'
+    c = tmp_path / 'c.igc'
+    a.write_text(flight_lines(18 * 3600, 30, gtype='JS-3-18m'))
+    b.write_text(flight_lines(18 * 3600, 30, gtype='ASG-29'))
+    c.write_text(flight_lines(18 * 3600, 30, gtype='Unknown'))
+    fa, fb, fc = (fingerprint(str(p)) for p in (a, b, c))
+    assert not same_flight(fa, fb)
+    # A missing type does not tell the gliders apart
+    assert same_flight(fa, fc)
+
+    dups = Duplicates()
+    assert dups.check(str(a)) is None
+    assert dups.check(str(b)) is None
+    assert dups.check(str(c)) == str(a)
@@ -0,0 +1,15 @@
+from igc_parser import parse_igc
+from flights import iter_flights
+
+
+def test_k_records_do_not_move_the_landing(flight_lines, flat_dem):
+    # One K record after every fix once the glider is down again
+    start = 18 * 3600
+    down = 200 + 30 * 60
+    k_lines = {i: 'K%06d030' % (start + i - 1) for i in range(down, down + 300)}
+    clean = list(iter_flights(parse_igc(flight_lines(start, 30).encode()), flat_dem))
+    flights = list(iter_flights(parse_igc(flight_lines(start, 30, extra=k_lines).encode()),
+                                flat_dem))
+    assert len(flights) == len(clean) == 1
+    assert flights[0].landing == clean[0].landing
+    assert flights[0].flight_time == clean[0].flight_time
@@ -0,0 +1,31 @@
+import pytest
+
+from shards import clear_done, mark_done, merge_csvs
+
+
+def _write_shard(directory, i, n, rows):
+    path = directory / f"Flt-times_2024.shard{i}of{n}.csv"
+    path.write_text('Date (MM/DD/YYYY),File,Gtype,Start Time,End Time\n'
+                    + ''.join(r + '\n' for r in rows), encoding='utf-8')
+
+
+def test_merge_accepts_shards_without_flights(tmp_path):
+    # Shards 1 and 3 found no flight and wrote no CSV, but did finish
+    _write_shard(tmp_path, 2, 3, ['06/01/2024,b.igc,JS-3-18m,120000,130000'])
+    for i in (1, 2, 3):
+        mark_done(i, 3, str(tmp_path))
+    merged = merge_csvs(str(tmp_path))
+    assert merged == {str(tmp_path / 'Flt-times_2024.csv'): (1, 0)}
+
+
+def test_merge_refuses_unfinished_shard(tmp_path):
+    _write_shard(tmp_path, 1, 2, ['06/01/2024,a.igc,JS-3-18m,120000,130000'])
+    _write_shard(tmp_path, 2, 2, ['06/01/2024,b.igc,JS-3-18m,120000,130000'])
+    mark_done(1, 2, str(tmp_path))
+    mark_done(2, 2, str(tmp_path))
+    clear_done(2, 2, str(tmp_path))
+    with pytest.raises(ValueError, match='2of2'):
+        merge_csvs(str(tmp_path))
+    assert not (tmp_path / 'Flt-times_2024.csv').exists()
+    merge_csvs(str(tmp_path), partial=True)
+    assert (tmp_path / 'Flt-times_2024.csv').exists()
@@ -0,0 +1,39 @@
+import numpy as np
+
+from timeaxis import unwrap
+from igc_parser import parse_igc
+from flights import iter_flights
+from conftest import b_record
+
+
+def test_unwrap_midnight():
+    assert unwrap([86398, 86399, 0, 1, 2]).tolist() == [86398, 86399, 0, 86401, 86402]
+    assert unwrap([5], prev=86399).tolist() == [86405]
+
+
+def test_unwrap_ignores_000000_glitch():
+    # A lone 000000 record mid-day is not the clock passing midnight
+    assert unwrap([50000, 50001, 0, 50002]).tolist() == [50000, 50001, 0, 50002]
+    assert unwrap([0, 50001], prev=50000).tolist() == [0, 50001]
+
+
+def test_000000_record_mid_trace(flight_lines, flat_dem):
+    start = 18 * 3600
+    glitch = b_record(0, 40.0, -105.0, 2000)
+    text = flight_lines(start, 60, extra={1800: glitch}).encode()
+    igc = parse_igc(text)
+    secs = igc.fixes['secs'][igc.fixes['hhmmss'] != 0]
+    assert secs.max() < 86400
+    assert np.all(np.diff(secs) > 0)
+
+    clean = list(iter_flights(parse_igc(flight_lines(start, 60).encode()), flat_dem))
+    flights = list(iter_flights(igc, flat_dem))
+    assert len(flights) == len(clean) == 1
+    assert flights[0].flight_time == clean[0].flight_time
+    assert flights[0].flight_time.startswith('1:0')
+
+
+def test_flight_across_midnight(flight_lines, flat_dem):
+    flights = list(iter_flights(parse_igc(flight_lines(86400 - 1800, 60).encode()), flat_dem))
+    assert len(flights) == 1
+    assert flights[0].flight_time.startswith('1:0')
@@ -0,0 +1,103 @@
+"""
+Time axis of IGC traces.
+
+B records only carry the UTC time of day, so a flight across 00:00 UTC
+(common in Australian contests) sees its clock jump back by a day.  The
+parser converts the times once into integer seconds that keep counting
+past 86400 (the 'secs' fix column), so durations and speeds are plain
+integer differences:
+
+    secs = unwrap(fixes['time'])          # [86390, 86395, 86400, 86405]
+    duration(secs[-1] - secs[0])          # '0:00:15'
+    hms(secs[-1])                         # '000005'
+
+resample() puts a trace on a uniform grid of whole multiples of `step`
+seconds, so logs from loggers with different fix rates line up:
+
+    grid, cols = resample(secs, {'msl': msl, 'ENL': enl}, step=4)
+"""
+
+import numpy as np
+
+DAY = 86400
+
+
+def hms_seconds(hms):
+    """'182314' -> 65594."""
+    return int(hms[0:2])*3600 + int(hms[2:4])*60 + int(hms[4:6])
+
+
+def hms(secs):
+    """Seconds (past midnight too) -> 'HHMMSS' of the UTC day."""
+    secs = int(secs) % DAY
+    return '%02d%02d%02d' % (secs // 3600, secs // 60 % 60, secs % 60)
+
+
+def duration(seconds):
+    """Seconds -> 'H:MM:SS', as the CSV reports flight times."""
+    seconds = int(seconds)
+    return '%d:%02d:%02d' % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def unwrap(tod, prev=None):
+    """
+    Seconds of the UTC day -> seconds since 00:00 UTC of the first day.
+
+    A step back of more than half a day is the clock passing midnight and
+    adds a day; smaller steps back (logger glitches) are kept as they are.
+    Times of 0 (B000000, what loggers write without a time or on a
+    glitch) are left out of the test, so one such record does not move
+    the rest of the trace a day on; they get 00:00:00 of the current day.
+    `prev` is the unwrapped time of the last non-zero fix before `tod[0]`,
+    when the times come in chunks.
+    """
+    tod = np.asarray(tod, dtype=np.int64)
+    if len(tod) == 0:
+        return tod
+    nz = tod != 0
+    if prev is None:
+        base, last = 0, (tod[nz][0] if nz.any() else 0)
+    else:
+        base, last = prev - prev % DAY, prev % DAY
+    # Each 0 takes the time of the non-zero fix before it
+    k = np.maximum.accumulate(np.where(nz, np.arange(len(tod)), -1))
+    filled = np.where(k >= 0, tod[np.maximum(k, 0)], last)
+    back = np.diff(filled, prepend=last) < -DAY // 2
+    return base + tod + DAY * np.cumsum(back)
+
+
+def grid(start, end, step=1):
+    """Multiples of `step` seconds from `start` to `end`, both included when on the grid."""
+    first = -(-int(start) // step) * step
+    return np.arange(first, int(end) + 1, step, dtype=np.int64)
+
+
+def resample(secs, columns, step=1, start=None, end=None, hold=None):
+    """
+    Put `columns` ({name: values at `secs`}) on a uniform time grid.
+
+    The grid holds the multiples of `step` between `start` and `end`
+    (default: the first and last fix).  Names in `hold` take the value of
+    the last fix at or before each grid time (sensor readings, flags);
+    the others are interpolated linearly.  By default integer and bool
+    columns are held and float columns interpolated.  Returns (grid,
+    {name: values on the grid}).
+    """
+    secs = np.asarray(secs, dtype=np.int64)
+    if len(secs) == 0:
+        return np.zeros(0, dtype=np.int64), {name: np.asarray(v)[:0]
+                                             for name, v in columns.items()}
+    t = grid(secs[0] if start is None else start, secs[-1] if end is None else end, step)
+    prev = np.clip(np.searchsorted(secs, t, side='right') - 1, 0, len(secs) - 1)
+    out = {}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        if hold is None:
+            held = values.dtype.kind in 'biu'
+        else:
+            held = name in hold
+        if held:
+            out[name] = values[prev]
+        else:
+            out[name] = np.interp(t, secs, values)
+    return t, out
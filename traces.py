@@ -0,0 +1,164 @@
+"""
+Per-flight altitude and sensor traces.
+
+Flight detection works out MSL, AGL, speed and the sensor readings of
+every fix and keeps only the summary.  With --traces DIR every flight's
+trace is written to DIR as one compressed .npz of columns, for plotting
+whole fleets without running the engine again:
+
+    meta, tr = read_trace('traces/4536-9239003146.igc-3f9a0c1d2e4b-0.npz')
+    plt.plot(tr['time'], tr['agl_ft'])
+    every5s = resample_trace(tr, step=5)
+    plt.plot(tr['time'][tr['full']], tr['ENL'][tr['full']])
+    meta['runs']          # [[kind, sensor, on, off, start, end], ...]
+
+Traces are downsampled with Douglas-Peucker on MSL and AGL altitude over
+time, so a plot that draws straight lines between the fixes kept is
+never more than `tol_ft` off, and keep every fix within `window_s`
+seconds of the start or end of an engine run (`full` marks those).
+
+Columns, one value per fix kept:
+
+    time        int32   seconds from 00:00 UTC of the flight's first
+                        fix, past 86400 after midnight
+    lat, lon    float32 degrees
+    msl_ft      float32 altitude above sea level (ft)
+    agl_ft      float32 altitude above the ground (ft)
+    speed_mph   float32 speed used for takeoff/landing detection
+    ENL/MOP/RPM int32   the engine sensors the logger has
+    full        bool    fix inside an engine run window
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+
+from archives import source_name
+from timeaxis import resample
+
+# Sensor columns exported when the logger has them
+SENSORS = ('ENL', 'MOP', 'RPM')
+
+
+def douglas_peucker(x, y, tol):
+    """
+    Mask of the points to keep so that linear interpolation between them
+    is never more than `tol` off y (measured along y, not perpendicular).
+    `x` must increase.  The first and last point are always kept.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        if x[b] > x[a]:
+            line = y[a] + (y[b] - y[a]) * (x[a+1:b] - x[a]) / (x[b] - x[a])
+        else:
+            line = y[a]  # time went backwards in the log
+        err = np.abs(y[a+1:b] - line)
+        i = int(np.argmax(err))
+        if err[i] > tol:
+            m = a + 1 + i
+            keep[m] = True
+            stack.append((a, m))
+            stack.append((m, b))
+    return keep
+
+
+class TraceExport(object):
+    """
+    Where and how traces are written: one .npz per flight in `directory`,
+    altitude kept to `tol_ft`, fixes within `window_s` seconds of engine
+    run starts and ends kept whole.  Small enough to hand to workers.
+    """
+
+    def __init__(self, directory, tol_ft=20.0, window_s=120):
+        self.directory = directory
+        self.tol_ft = tol_ft
+        self.window_s = window_s
+        os.makedirs(directory, exist_ok=True)
+
+    def build(self, fx, proc, runs):
+        """
+        Trace columns of one flight from the fix columns `fx`, the fixes
+        the detection used (`proc`, see flights.engine_runs) and the
+        flight's EngineRuns.
+        """
+        idx = np.asarray(proc['k'], dtype=np.intp)
+        tod = np.asarray(fx['time'])[idx]
+        t = np.asarray(fx['secs'])[idx]
+        msl = np.asarray(proc['msl'], dtype=np.float64)
+        agl = np.asarray(proc['agl'], dtype=np.float64)
+
+        full = np.zeros(len(idx), dtype=bool)
+        for run in runs:
+            for hms in (run.start, run.end):
+                s = int(hms[0:2])*3600 + int(hms[2:4])*60 + int(hms[4:6])
+                d = (tod - s) % 86400
+                full |= (d <= self.window_s) | (d >= 86400 - self.window_s)
+        keep = (full | douglas_peucker(t, msl, self.tol_ft) |
+                douglas_peucker(t, agl, self.tol_ft))
+
+        trace = {
+            'time': t[keep].astype(np.int32),
+            'lat': np.asarray(fx['lat'])[idx][keep].astype(np.float32),
+            'lon': np.asarray(fx['lon'])[idx][keep].astype(np.float32),
+            'msl_ft': msl[keep].astype(np.float32),
+            'agl_ft': agl[keep].astype(np.float32),
+            'speed_mph': np.asarray(proc['spd'], dtype=np.float32)[keep],
+        }
+        for tag in SENSORS:
+            if tag in fx:
+                trace[tag] = np.asarray(fx[tag])[idx][keep].astype(np.int32)
+        trace['full'] = full[keep]
+        return trace
+
+    def path(self, path, index):
+        path = os.path.abspath(path)
+        h = hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.directory, f"{source_name(path)}-{h}-{index}.npz")
+
+    def write(self, path, flight):
+        """Write flight.trace of a flight found in IGC file `path`."""
+        meta = {
+            'path': path, 'file': flight.file, 'index': flight.index,
+            'date': flight.date, 'gtype': flight.gtype, 'sensor': flight.sensor,
+            'takeoff': flight.takeoff, 'landing': flight.landing,
+            'landed': flight.landed, 'landing_class': flight.landing_class,
+            'tol_ft': self.tol_ft, 'window_s': self.window_s,
+            'runs': [[r.kind, r.sensor, r.on, r.off, r.start, r.end]
+                     for r in flight.engine_runs],
+        }
+        out = self.path(path, flight.index)
+        tmp = out[:-4] + '.tmp.npz'
+        np.savez_compressed(tmp, meta=np.array(json.dumps(meta)), **flight.trace)
+        os.replace(tmp, out)
+        return out
+
+
+def resample_trace(trace, step=1):
+    """
+    A trace (as read_trace() returns it) on a uniform grid of `step`
+    seconds: altitudes, speed and position interpolated, sensor readings
+    and `full` held from the fix before.  Traces of loggers with
+    different fix rates resampled with the same step line up.
+    """
+    cols = {k: v for k, v in trace.items() if k != 'time'}
+    t, out = resample(trace['time'], cols, step)
+    out['time'] = t.astype(np.int32)
+    return out
+
+
+def read_trace(path):
+    """(meta dict, {column: array}) of a trace file."""
+    with np.load(path) as z:
+        meta = json.loads(str(z['meta']))
+        return meta, {k: z[k] for k in z.files if k != 'meta'}